@@ -0,0 +1,348 @@
+import argparse
+import asyncio
+import contextlib
+import curses
+import datetime
+import gc
+import json
+import os
+import platform
+import selectors
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from importlib import metadata
+from unittest import mock
+
+import yaml
+
+from tasks_pipeline import BaseTask, TaskStatus
+from tasks_pipeline.config import load_config
+from tasks_pipeline.pipeline_model import PipelineModel
+from tasks_pipeline.view import ScreenRenderer, display
+
+
+SHAPES = ('flat', 'deep', 'wide')
+SIZES = (10, 100, 1000, 10000, 100000)
+
+
+class NoopTask(BaseTask):
+    async def run(self):
+        await super().run()
+        await super().complete(TaskStatus.COMPLETED)
+
+
+def leaf(i, sleep):
+    if sleep is None:
+        return {'type': '__main__.NoopTask', 'name': f'task {i}'}
+    return {'type': 'WaitForTask', 'name': f'task {i}', 'params': {'waitFor': sleep}}
+
+
+def generate_config(shape, size, sleep=None, depth=100):
+    if shape == 'flat':
+        rootTask = {'type': 'ParallelTask', 'tasks': [leaf(i, sleep) for i in range(size)]}
+
+    elif shape == 'deep':
+        # chains of nested sequential tasks, one leaf per level, so the depth stays within the recursion limit
+        chains = []
+        for start in range(0, size, depth):
+            chain = None
+            for i in reversed(range(start, min(start + depth, size))):
+                chain = {'type': 'SequentialTask', 'tasks': [leaf(i, sleep)] + ([chain] if chain else [])}
+            chains.append(chain)
+        rootTask = {'type': 'SequentialTask', 'tasks': chains}
+
+    elif shape == 'wide':
+        # three levels of parallel tasks with the same fan-out
+        fanOut = max(round(size ** (1 / 3)), 1)
+        leaves = iter(range(size))
+        groups = []
+        while len(groups) * fanOut * fanOut < size:
+            subgroups = []
+            for _ in range(fanOut):
+                tasks = [leaf(i, sleep) for _, i in zip(range(fanOut), leaves)]
+                if tasks:
+                    subgroups.append({'type': 'ParallelTask', 'tasks': tasks})
+            groups.append({'type': 'ParallelTask', 'tasks': subgroups})
+        rootTask = {'type': 'ParallelTask', 'tasks': groups}
+
+    else:
+        raise ValueError(f'unknown shape {shape!r}')
+
+    return {'title': f'{shape} {size}', 'rootTask': rootTask}
+
+
+class DummyWindow:
+    def __init__(self, nlines=50, ncols=200):
+        self.nlines = nlines
+        self.ncols = ncols
+
+    def getmaxyx(self):
+        return self.nlines, self.ncols
+
+    def erase(self):
+        pass
+
+    def addstr(self, *args):
+        pass
+
+    def noutrefresh(self):
+        pass
+
+
+@contextlib.contextmanager
+def dummy_curses():
+    with mock.patch.multiple(
+        curses,
+        newwin=lambda nlines, ncols, y, x: DummyWindow(nlines, ncols),
+        doupdate=lambda: None,
+        init_color=lambda *args: None,
+        init_pair=lambda *args: None,
+        color_pair=lambda n: n << 8,
+        COLORS=256,
+        create=True,
+    ):
+        yield
+
+
+class CountingSelector(selectors.DefaultSelector):
+    def __init__(self):
+        super().__init__()
+        self.wakeups = 0
+
+    def select(self, timeout=None):
+        events = super().select(timeout)
+        self.wakeups += 1
+        return events
+
+
+def count_leaves(model):
+    return sum(1 for t in model.tasks if not t.subtasks)
+
+
+def bench_config_load(shape, size, depth):
+    config = generate_config(shape, size, depth=depth)
+    with tempfile.NamedTemporaryFile('w', suffix='.yaml', delete=False, encoding='utf-8') as f:
+        yaml.safe_dump(config, f, allow_unicode=True)
+    try:
+        gc.collect()
+        start = time.perf_counter()
+        config = load_config(f.name, useCache=False)
+        loaded = time.perf_counter()
+        model = PipelineModel(config)
+        built = time.perf_counter()
+
+        gc.collect()
+        tracemalloc.start()
+        config = load_config(f.name, useCache=False)
+        configMemory = tracemalloc.get_traced_memory()[0]
+        model = PipelineModel(config)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        os.unlink(f.name)
+
+    return {
+        'tasks': len(model.tasks),
+        'load_config_seconds': loaded - start,
+        'create_task_models_seconds': built - loaded,
+        'config_bytes': configMemory,
+        'model_bytes': current - configMemory,
+        'peak_bytes': peak,
+    }
+
+
+def bench_scheduler(shape, size, depth, sleep=None):
+    model = PipelineModel(generate_config(shape, size, sleep, depth))
+    leaves = count_leaves(model)
+
+    gc.collect()
+    start = time.perf_counter()
+    asyncio.run(model.rootTask.task.execute())
+    elapsed = time.perf_counter() - start
+
+    if model.rootTask.task.status != TaskStatus.COMPLETED:
+        raise RuntimeError(f'pipeline finished with status {model.rootTask.task.status.name}')
+
+    # with sleeping leaves the ideal run time of the parallel shapes is one sleep, anything above it is overhead
+    overhead = elapsed - (sleep or 0)
+    return {
+        'tasks': len(model.tasks),
+        'leaves': leaves,
+        'seconds': elapsed,
+        'overhead_seconds': overhead,
+        'overhead_per_task_us': overhead / len(model.tasks) * 1e6,
+    }
+
+
+def bench_render(shape, size, depth, frames):
+    model = PipelineModel(generate_config(shape, size, depth=depth))
+
+    with dummy_curses():
+        renderer = ScreenRenderer(DummyWindow(), model)
+
+        idle = []
+        for _ in range(frames):
+            start = time.perf_counter()
+            renderer.update()
+            idle.append(time.perf_counter() - start)
+
+        changed = []
+        for frame in range(frames):
+            for taskModel in model.visibleTasks:
+                taskModel.task.message = f'frame {frame}'
+            start = time.perf_counter()
+            renderer.update()
+            changed.append(time.perf_counter() - start)
+
+    def summary(samples):
+        return {
+            'mean_us': statistics.fmean(samples) * 1e6,
+            'p50_us': statistics.median(samples) * 1e6,
+            'max_us': max(samples) * 1e6,
+        }
+
+    return {'tasks': len(model.tasks), 'frames': frames, 'idle': summary(idle), 'changed': summary(changed)}
+
+
+def bench_idle_wakeups(shape, size, depth, seconds, withDisplay):
+    model = PipelineModel(generate_config(shape, size, 3600, depth))
+    selector = CountingSelector()
+    loop = asyncio.SelectorEventLoop(selector)
+
+    async def idle():
+        pipeline = asyncio.create_task(model.rootTask.task.execute())
+        renderer = None
+        if withDisplay:
+            renderer = asyncio.create_task(display(DummyWindow(), model))
+        # let every task start before counting
+        await asyncio.sleep(0.5)
+        wakeups = selector.wakeups
+        await asyncio.sleep(seconds)
+        wakeups = selector.wakeups - wakeups
+
+        await model.rootTask.task.cancel()
+        for t in (pipeline, renderer):
+            if t:
+                t.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await t
+        return wakeups
+
+    try:
+        with dummy_curses():
+            wakeups = loop.run_until_complete(idle())
+    finally:
+        loop.close()
+
+    return {'tasks': len(model.tasks), 'seconds': seconds, 'wakeups_per_second': wakeups / seconds}
+
+
+def package_version():
+    try:
+        return metadata.version('tasks_pipeline')
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def run(args):
+    benchmarks = {
+        'config_load': lambda shape, size: bench_config_load(shape, size, args.depth),
+        'scheduler_noop': lambda shape, size: bench_scheduler(shape, size, args.depth),
+        'scheduler_sleep': lambda shape, size: bench_scheduler(shape, size, args.depth, 1),
+        'render': lambda shape, size: bench_render(shape, size, args.depth, args.frames),
+        'idle_wakeups_headless': lambda shape, size: bench_idle_wakeups(
+            shape, size, args.depth, args.idle_seconds, False
+        ),
+        'idle_wakeups_display': lambda shape, size: bench_idle_wakeups(
+            shape, size, args.depth, args.idle_seconds, True
+        ),
+    }
+
+    results = []
+    for name in args.benchmark or benchmarks:
+        for shape in args.shape or SHAPES:
+            # sleeping leaves in a sequential chain would take one second each
+            if name == 'scheduler_sleep' and shape == 'deep':
+                continue
+            for size in args.size or SIZES:
+                print(f'{name} {shape} {size}', file=sys.stderr, flush=True)
+                result = {'benchmark': name, 'shape': shape, 'size': size}
+                try:
+                    result.update(benchmarks[name](shape, size))
+                except Exception as e:
+                    result['error'] = f'{type(e).__name__}: {e}'
+                results.append(result)
+
+    return {
+        'version': package_version(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': datetime.datetime.now().isoformat(),
+        'results': results,
+    }
+
+
+def flatten_metrics(result, prefix=''):
+    metrics = {}
+    for key, value in result.items():
+        if isinstance(value, dict):
+            metrics.update(flatten_metrics(value, f'{prefix}{key}.'))
+        elif isinstance(value, int | float) and key not in ('size', 'tasks', 'leaves', 'frames', 'seconds'):
+            metrics[prefix + key] = value
+    return metrics
+
+
+def compare(report, baselineFile):
+    with open(baselineFile, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    key = lambda r: (r['benchmark'], r['shape'], r['size'])  # noqa: E731
+    baselineResults = {key(r): flatten_metrics(r) for r in baseline['results']}
+
+    print(f'compared with {baselineFile} (version {baseline.get("version")}):', file=sys.stderr)
+    for result in report['results']:
+        if key(result) not in baselineResults:
+            continue
+        before = baselineResults[key(result)]
+        for metric, value in flatten_metrics(result).items():
+            if before.get(metric):
+                print(
+                    f'  {" ".join(map(str, key(result)))} {metric}: {before[metric]:.6g} -> {value:.6g}'
+                    f' ({value / before[metric]:.2f}x)',
+                    file=sys.stderr,
+                )
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description='Measure the overhead of tasks_pipeline on synthetic pipelines')
+    parser.add_argument('--benchmark', action='append', help='run only this benchmark (can be repeated)')
+    parser.add_argument('--shape', action='append', choices=SHAPES, help='run only this shape (can be repeated)')
+    parser.add_argument('--size', action='append', type=int, help='number of leaf tasks (can be repeated)')
+    parser.add_argument('--depth', type=int, default=100, help='nesting depth of the deep shape')
+    parser.add_argument('--frames', type=int, default=100, help='frames rendered per render benchmark')
+    parser.add_argument('--idle-seconds', type=float, default=2, help='how long to count idle wakeups')
+    parser.add_argument('--output', metavar='FILE', help='write the JSON report to FILE instead of stdout')
+    parser.add_argument('--compare', metavar='FILE', help='print the ratio of every metric to a previous report')
+    return parser.parse_args(args)
+
+
+def main():
+    args = parse_args()
+    report = run(args)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == '__main__':
+    main()
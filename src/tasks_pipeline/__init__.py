@@ -1,21 +1,18 @@
-from .tasks import BaseTask
-from .tasks import TaskStatus
-from .tasks import WaitUntilTask
-from .tasks import WaitForTask
-from .tasks import ParallelTask
-from .tasks import SequentialTask
-from .tasks import RunProcessTask
-from .tasks import RetryTask
-from .tasks import PortConnectivityTask
+import importlib
 
-__all__ = [
-    'BaseTask',
-    'TaskStatus',
-    'WaitUntilTask',
-    'WaitForTask',
-    'ParallelTask',
-    'SequentialTask',
-    'RunProcessTask',
-    'RetryTask',
-    'PortConnectivityTask',
-]
+from .tasks import TASK_MODULES
+
+
+__all__ = list(TASK_MODULES)
+
+
+def __getattr__(name):
+    if name in TASK_MODULES:
+        value = getattr(importlib.import_module('.tasks', __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,90 @@
+import datetime
+import hashlib
+import json
+import logging
+
+from .tasks import TaskStatus
+from .pipeline_model import PipelineModel
+
+
+logger = logging.getLogger('tasks_pipeline.checkpoint')
+
+
+def config_hash(config):
+    return hashlib.sha256(json.dumps(config['rootTask'], sort_keys=True, default=str).encode()).hexdigest()
+
+
+class Checkpoint:
+    def __init__(self, path, configHash):
+        self.path = path
+        self.configHash = configHash
+        self.journal = None
+        # the completed records of the previous run, kept to restore matrix rows when they are created
+        self.records = {}
+
+    def load(self):
+        records = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # the last line may be incomplete if the previous run was killed mid write
+                        continue
+                    if record.get('configHash') == self.configHash:
+                        records[record['index']] = record
+        except FileNotFoundError:
+            pass
+        return records
+
+    def restore(self, model: PipelineModel):
+        self.records = {
+            index: record for index, record in self.load().items() if record['status'] == TaskStatus.COMPLETED.name
+        }
+        restored = sum(self.restore_task(taskModel) for taskModel in model.tasks)
+        logger.info(f'restored {restored} completed tasks from {self.path}')
+
+    def restore_task(self, taskModel):
+        record = self.records.pop(taskModel.taskIndex, None)
+        if not record:
+            return False
+        task = taskModel.task
+        task.startTime = datetime.datetime.fromisoformat(record['startTime']) if record['startTime'] else None
+        task.stopTime = datetime.datetime.fromisoformat(record['stopTime']) if record['stopTime'] else None
+        task.message = record['message']
+        # restored is set first, so status listeners can tell a restored task from one completed in this run
+        task.restored = True
+        task.status = TaskStatus.COMPLETED
+        return True
+
+    def attach(self, model: PipelineModel, resume=False):
+        self.journal = open(self.path, 'a' if resume else 'w', encoding='utf-8', buffering=1)
+        model.watch_tasks(self.watch)
+
+    def watch(self, taskModel):
+        # the tasks of the model are restored before, matrix rows when they are created
+        if self.records:
+            self.restore_task(taskModel)
+        taskModel.task.add_status_listener(lambda task, oldStatus, newStatus, t=taskModel: self.write(t))
+
+    def write(self, taskModel):
+        task = taskModel.task
+        record = {
+            'configHash': self.configHash,
+            'index': taskModel.taskIndex,
+            'name': taskModel.name,
+            'status': task.status.name,
+            'message': task.message,
+            'startTime': task.startTime.isoformat() if task.startTime else None,
+            'stopTime': task.stopTime.isoformat() if task.stopTime else None,
+        }
+        self.journal.write(json.dumps(record) + '\n')
+
+
+def setup_checkpoint(model: PipelineModel, path, resume=False):
+    checkpoint = Checkpoint(path, config_hash(model.config))
+    if resume:
+        checkpoint.restore(model)
+    checkpoint.attach(model, resume)
+    return checkpoint
@@ -1,16 +1,257 @@
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import os
+import stat
+
 import yaml
 
+from .registry import get_task_class
+from .matrix import Matrix
+
+
+logger = logging.getLogger('tasks_pipeline.config')
+
 
 config = None
 
+# bump when the validation rules change so configs validated by older rules are checked again
+CACHE_VERSION = 5
+
+Loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+def default_cache_directory():
+    if directory := os.environ.get('TASKS_PIPELINE_CONFIG_CACHE'):
+        return directory
+    cacheHome = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cacheHome, 'tasks_pipeline', 'config')
+
+
+def cache_path(path, directory):
+    st = os.stat(path)
+    key = json.dumps([os.path.abspath(path), st.st_mtime_ns, st.st_size, CACHE_VERSION])
+    return os.path.join(directory, hashlib.sha256(key.encode()).hexdigest() + '.json')
+
+
+def is_private(st):
+    # a cache that someone else can write could inject commands into the pipeline
+    if hasattr(os, 'getuid') and st.st_uid != os.getuid():
+        return False
+    return not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+def read_cache(path):
+    try:
+        with open(path, 'rb') as f:
+            if not is_private(os.stat(os.path.dirname(path))) or not is_private(os.fstat(f.fileno())):
+                logger.warning(f'ignoring config cache {path} writable by other users')
+                return None
+            return json.loads(f.read())
+    except FileNotFoundError:
+        return None
+    except Exception:
+        logger.warning(f'ignoring unreadable config cache {path}', exc_info=True)
+        return None
 
-def load_config(path):
+
+def write_cache(path, config):
+    # only configs that survive the round trip are cached, yaml dates or integer keys do not
+    try:
+        data = json.dumps(config, separators=(',', ':'))
+    except (TypeError, ValueError):
+        return
+    if json.loads(data) != config:
+        return
+
+    try:
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        tmpPath = f'{path}.{os.getpid()}.tmp'
+        fd = os.open(tmpPath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with open(fd, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmpPath, path)
+    except OSError:
+        logger.warning(f'could not write config cache {path}', exc_info=True)
+
+
+def load_config(path, useCache=True, cacheDirectory=None):
     global config
+
+    cachePath = cache_path(path, cacheDirectory or default_cache_directory()) if useCache else None
+    if cachePath and (cached := read_cache(cachePath)) is not None:
+        config = cached
+        return config
+
     with open(path, 'rb') as f:
-        config = yaml.safe_load(f.read().decode('utf-8'))
+        config = yaml.load(f.read().decode('utf-8'), Loader=Loader)
+
+    resolve_matrix_files(config, os.path.dirname(os.path.abspath(path)))
+    validate_config(config)
+
+    if cachePath:
+        write_cache(cachePath, config)
     return config
 
 
+def resolve_matrix_files(config, directory):
+    # {file: ...} in a matrix is relative to the config file, not to where the pipeline is started
+    stack = [config.get('rootTask')] if isinstance(config, dict) else []
+    while stack:
+        task = stack.pop()
+        if not isinstance(task, dict):
+            continue
+        if isinstance(task.get('matrix'), dict):
+            for source in task['matrix'].values():
+                if isinstance(source, dict) and isinstance(source.get('file'), str):
+                    source['file'] = os.path.join(directory, source['file'])
+        if isinstance(task.get('tasks'), list):
+            stack.extend(task['tasks'])
+
+
 def get_config():
     global config
     return config
+
+
+def check_type(value, expected):
+    if expected in (int, float):
+        expected = int | float
+    elif expected is list:
+        expected = list | tuple
+    try:
+        return isinstance(value, expected)
+    except TypeError:
+        # annotations isinstance cannot check, like generics
+        return True
+
+
+@functools.cache
+def task_signature(cls):
+    # the signature of __init__ without self, the task itself is only created with the model
+    try:
+        return inspect.signature(cls)
+    except ValueError:
+        return None
+
+
+def validate_params(cls, name, params):
+    errors = []
+    if signature := task_signature(cls):
+        try:
+            signature.bind(name, **params)
+        except TypeError as e:
+            return [str(e)]
+
+    if signature:
+        for paramName, value in params.items():
+            parameter = signature.parameters.get(paramName)
+            if parameter is None or value is None:
+                continue
+            if parameter.annotation is not inspect.Parameter.empty and not isinstance(parameter.annotation, str):
+                expected = parameter.annotation
+            elif parameter.default not in (inspect.Parameter.empty, None):
+                expected = type(parameter.default)
+            else:
+                continue
+            if not check_type(value, expected):
+                expectedName = getattr(expected, '__name__', str(expected))
+                errors.append(f'parameter {paramName!r} expected {expectedName}, got {type(value).__name__} {value!r}')
+
+    # the values the constructor would reject, checked without creating the task
+    if not errors and (check_params := getattr(cls, 'check_params', None)):
+        errors.extend(check_params(params))
+
+    return errors
+
+
+def validate_task(task, prefix, taskClasses):
+    errors = []
+    taskType = task.get('type')
+    params = task.get('params') or {}
+
+    if not isinstance(params, dict):
+        errors.append(f'{prefix}: params expected a mapping, got {type(params).__name__}')
+        params = None
+    for key in ('disabled', 'collapsed', 'remote'):
+        if key in task and not isinstance(task[key], bool):
+            errors.append(f'{prefix}: {key} expected true or false, got {task[key]!r}')
+    if not isinstance(task.get('resources', {}), dict) or not all(
+        isinstance(v, int | float) for v in task.get('resources', {}).values()
+    ):
+        errors.append(f'{prefix}: resources expected a mapping of resource names to amounts')
+    if not isinstance(task.get('needs', []), list):
+        errors.append(f'{prefix}: needs expected a list of task ids')
+
+    if not isinstance(taskType, str):
+        errors.append(f'{prefix}: type is missing')
+        return errors, None
+
+    if taskType not in taskClasses:
+        try:
+            taskClasses[taskType] = get_task_class(taskType)
+        except (ImportError, AttributeError, ValueError):
+            taskClasses[taskType] = None
+
+    if (cls := taskClasses[taskType]) is None:
+        errors.append(f'{prefix}: unknown task type {taskType!r}')
+    elif params is not None:
+        paramErrors = validate_params(cls, task.get('name', ''), params)
+        errors.extend(f'{prefix}: {taskType} {e}' for e in paramErrors)
+    return errors, cls
+
+
+def validate_matrix(task, prefix, cls, taskClasses):
+    from .tasks import ParallelTask
+
+    if (cls and not issubclass(cls, ParallelTask)) or task.get('tasks'):
+        return [f'{prefix}: "matrix" is only supported on a ParallelTask without tasks'], 0
+    try:
+        matrix = Matrix(task['matrix'], task.get('task'))
+    except (OSError, ValueError) as e:
+        return [f'{prefix}: {e}'], 0
+    if not len(matrix):
+        return [], 0
+
+    # the template is checked once, rendered with the first values of the matrix
+    errors, _ = validate_task(matrix.task_config(0), f'{prefix} matrix task {matrix.values(0)}', taskClasses)
+    return errors, len(matrix)
+
+
+def validate_config(config):
+    if not isinstance(config, dict):
+        raise ValueError('invalid config: expected a mapping at the top level')
+    if not isinstance(config.get('rootTask'), dict):
+        raise ValueError('invalid config: rootTask is missing or is not a mapping')
+
+    errors = []
+    taskClasses = {}
+    taskIndex = 0
+    stack = [config['rootTask']]
+    while stack:
+        task = stack.pop()
+        taskIndex += 1
+
+        if not isinstance(task, dict):
+            errors.append(f'task {taskIndex}: expected a mapping, got {type(task).__name__}')
+            continue
+
+        prefix = f'task {taskIndex} ({task.get("name", "")})'
+        taskErrors, cls = validate_task(task, prefix, taskClasses)
+        errors.extend(taskErrors)
+        if 'matrix' in task:
+            matrixErrors, rows = validate_matrix(task, prefix, cls, taskClasses)
+            errors.extend(matrixErrors)
+            # the rows are numbered after the matrix task, like in the model
+            taskIndex += rows
+
+        children = task.get('tasks', [])
+        if not isinstance(children, list):
+            errors.append(f'{prefix}: tasks expected a list, got {type(children).__name__}')
+            children = []
+        stack.extend(reversed(children))
+
+    if errors:
+        raise ValueError('invalid config:\n  ' + '\n  '.join(errors))
@@ -2,11 +2,14 @@ from contextlib import suppress
 import curses
 import asyncio
 import logging
+import sys
 
 from .tasks import TaskStatus
 from .pipeline_model import PipelineModel, InputMode
 from .util import tasks_apply
+from .resources import is_waiting_for_resources
 from .view import notify
+from .output_spool import Pager, get_output_path
 
 
 logger = logging.getLogger('tasks_pipeline.controller')
@@ -14,91 +17,193 @@ logger = logging.getLogger('tasks_pipeline.controller')
 
 async def start_tasks(taskModel):
     logger.info(f'start task: {taskModel.taskIndex=}, {taskModel.name=}')
-    await taskModel.task.run()
+    await taskModel.task.execute()
+
+    def f(taskModel):
+        taskModel.task.restored = False
+
+    tasks_apply(taskModel, f)
     notify('All tasks completed')
 
 
-async def disable_task(taskModel):
+async def disable_task(model, taskModel):
     logger.info(f'disable task: {taskModel.taskIndex=}, {taskModel.name=}')
 
     def f(task):
         task.task.status = TaskStatus.DISABLED
 
     tasks_apply(taskModel, f)
+    model.update_disabled(taskModel)
 
 
-async def enable_task(taskModel):
+async def enable_task(model, taskModel):
     logger.info(f'enable task: {taskModel.taskIndex=}, {taskModel.name=}')
 
     def f(taskModel):
         taskModel.task.status = TaskStatus.NOT_STARTED
 
     tasks_apply(taskModel, f)
+    model.update_disabled(taskModel)
 
 
 async def cancel_task(taskModel):
     def f(taskModel):
-        if taskModel.task.status == TaskStatus.RUNNING:
+        # a task queued for resources is not running yet but it can be cancelled as well
+        if taskModel.task.status == TaskStatus.RUNNING or is_waiting_for_resources(taskModel.task):
             asyncio.create_task(taskModel.task.cancel())
 
     tasks_apply(taskModel, f)
 
 
+def open_output(model, taskModel):
+    if path := get_output_path(taskModel.task):
+        model.pager = Pager(path, f'{taskModel.taskIndex} {taskModel.name}')
+        model.inputMode = InputMode.PAGER
+    else:
+        model.inputMode = InputMode.NONE
+
+
+def close_output(model):
+    model.pager.close()
+    model.pager = None
+    model.inputMode = InputMode.NONE
+
+
+async def read_keys(stdscr):
+    loop = asyncio.get_running_loop()
+    stdinFd = sys.stdin.fileno()
+    keysAvailable = asyncio.Event()
+    try:
+        loop.add_reader(stdinFd, keysAvailable.set)
+    except NotImplementedError:
+        # the proactor event loop (Windows) does not support readers, so poll instead
+        keysAvailable = None
+
+    try:
+        while True:
+            if keysAvailable:
+                await keysAvailable.wait()
+                keysAvailable.clear()
+            else:
+                await asyncio.sleep(0.1)
+
+            keys = []
+            with suppress(curses.error):
+                while True:
+                    keys.append(stdscr.getkey())
+            if keys:
+                yield keys
+    finally:
+        if keysAvailable:
+            loop.remove_reader(stdinFd)
+
+
 async def process_input(stdscr, model: PipelineModel):
     stdscr.nodelay(True)
 
     model.inputMode = InputMode.NONE
     model.selectedTaskText = ''
 
-    while True:
-        with suppress(curses.error):
-            k = stdscr.getkey()
-            match model.inputMode:
-                case InputMode.NONE:
-                    if k == ':':
-                        model.inputMode = InputMode.GET_TASK
-                        model.selectedTaskText = ''
-                    elif k.lower() == 's':
-                        asyncio.create_task(start_tasks(model.rootTask))
-                    elif k.lower() == 'x':
-                        return
-                    elif k == 'KEY_DOWN':
-                        model.scrollDown()
-                    elif k == 'KEY_UP':
-                        model.scrollUp()
-
-                case InputMode.GET_TASK:
-                    if k == '\n':
-                        if model.selectedTaskText.isnumeric():
-                            model.selectTask(model.selectedTaskText)
-                            if model.selectedTask:
-                                model.inputMode = InputMode.GET_COMMAND
-                            else:
-                                model.inputMode = InputMode.NONE
-                        else:
-                            model.inputMode = InputMode.NONE
-                    if ord(k) == 8:  # back
-                        model.selectedTaskText = model.selectedTaskText[:-1]
+    async for keys in read_keys(stdscr):
+        for k in keys:
+            if not await process_key(k, model):
+                return
+        model.hasUpdates = True
+
+
+async def process_key(k, model: PipelineModel):
+    match model.inputMode:
+        case InputMode.NONE:
+            if k == ':':
+                model.inputMode = InputMode.GET_TASK
+                model.selectedTaskText = ''
+            elif k.lower() == 's':
+                asyncio.create_task(start_tasks(model.rootTask))
+            elif k.lower() == 'x':
+                return False
+            elif k == 'KEY_DOWN':
+                model.scrollDown()
+            elif k == 'KEY_UP':
+                model.scrollUp()
+            elif k == 'KEY_NPAGE':
+                model.scrollPageDown()
+            elif k == 'KEY_PPAGE':
+                model.scrollPageUp()
+
+        case InputMode.GET_TASK:
+            if k == '\n':
+                if model.selectedTaskText:
+                    model.selectTask(model.selectedTaskText)
+                    if model.selectedTask:
+                        model.inputMode = InputMode.GET_COMMAND
                     else:
-                        model.selectedTaskText += k
-
-                case InputMode.GET_COMMAND:
-                    if k.lower() == 'd':
-                        await disable_task(model.selectedTask)
-                        model.selectedTaskText = ''
                         model.inputMode = InputMode.NONE
-                    if k.lower() == 'e':
-                        await enable_task(model.selectedTask)
-                        model.selectedTaskText = ''
-                        model.inputMode = InputMode.NONE
-                    if k.lower() == 's':
-                        asyncio.create_task(start_tasks(model.selectedTask))
-                        model.selectedTaskText = ''
-                        model.inputMode = InputMode.NONE
-                    if k.lower() == 'c':
-                        asyncio.create_task(cancel_task(model.selectedTask))
-                        model.selectedTaskText = ''
-                        model.inputMode = InputMode.NONE
-
-            model.hasUpdates = True
-        await asyncio.sleep(0.1)
+                else:
+                    model.inputMode = InputMode.NONE
+            if ord(k) == 8:  # back
+                model.selectedTaskText = model.selectedTaskText[:-1]
+            else:
+                model.selectedTaskText += k
+
+        case InputMode.GET_COMMAND:
+            if k.lower() == 'd':
+                await disable_task(model, model.selectedTask)
+                model.selectedTaskText = ''
+                model.inputMode = InputMode.NONE
+            if k.lower() == 'e':
+                await enable_task(model, model.selectedTask)
+                model.selectedTaskText = ''
+                model.inputMode = InputMode.NONE
+            if k.lower() == 's':
+                asyncio.create_task(start_tasks(model.selectedTask))
+                model.selectedTaskText = ''
+                model.inputMode = InputMode.NONE
+            if k.lower() == 'c':
+                asyncio.create_task(cancel_task(model.selectedTask))
+                model.selectedTaskText = ''
+                model.inputMode = InputMode.NONE
+            if k.lower() == 'f':
+                model.toggleCollapsed(model.selectedTask)
+                model.selectedTaskText = ''
+                model.inputMode = InputMode.NONE
+            if k.lower() == 'o':
+                open_output(model, model.selectedTask)
+                model.selectedTaskText = ''
+
+        case InputMode.PAGER:
+            pager = model.pager
+            if k in ('q', 'Q', 'x', 'X', '\x1b'):
+                close_output(model)
+            elif k in ('KEY_DOWN', 'j', '\n'):
+                pager.scroll(1)
+            elif k in ('KEY_UP', 'k'):
+                pager.scroll(-1)
+            elif k in ('KEY_NPAGE', ' '):
+                pager.scroll(pager.pageSize)
+            elif k in ('KEY_PPAGE', 'b'):
+                pager.scroll(-pager.pageSize)
+            elif k in ('KEY_HOME', 'g'):
+                pager.home()
+            elif k in ('KEY_END', 'G'):
+                pager.end()
+            elif k == '/':
+                pager.searchText = ''
+                model.inputMode = InputMode.PAGER_SEARCH
+            elif k == 'n':
+                pager.search()
+            elif k == 'N':
+                pager.search(backwards=True)
+
+        case InputMode.PAGER_SEARCH:
+            pager = model.pager
+            if k == '\n':
+                pager.search()
+                model.inputMode = InputMode.PAGER
+            elif k == '\x1b':
+                model.inputMode = InputMode.PAGER
+            elif k in ('KEY_BACKSPACE', '\b', '\x7f'):
+                pager.searchText = pager.searchText[:-1]
+            elif len(k) == 1:
+                pager.searchText += k
+
+    return True
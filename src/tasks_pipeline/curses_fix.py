@@ -2,7 +2,7 @@ import curses
 
 def mywrapper(fn):
 
-    def inner():
+    def inner(*args, **kwargs):
         try:
             if 1:  # Call our own version of curses.initscr().
                 import _curses
@@ -21,7 +21,7 @@ def mywrapper(fn):
             curses.start_color()
             stdscr.keypad(True)
             stdscr.refresh()
-            fn(stdscr)
+            fn(stdscr, *args, **kwargs)
 
         finally:
             curses.nocbreak()
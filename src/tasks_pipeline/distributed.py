@@ -0,0 +1,314 @@
+import asyncio
+import datetime
+import hashlib
+import hmac
+import itertools
+import json
+import logging
+import os
+import secrets
+from collections import deque
+from contextlib import suppress
+
+from .tasks import BaseTask, TaskStatus
+from .pipeline_model import create_task
+
+
+logger = logging.getLogger('tasks_pipeline.distributed')
+
+# set to the same secret on the coordinator and its workers, each side then proves it knows it
+TOKEN_VARIABLE = 'TASKS_PIPELINE_TOKEN'
+
+
+def get_token():
+    return os.environ.get(TOKEN_VARIABLE) or None
+
+
+def proof(token, role, nonce):
+    # the token itself never goes over the connection, only a signature of the other side's nonce
+    return hmac.new(token.encode(), f'{role}:{nonce}'.encode(), hashlib.sha256).hexdigest()
+
+
+def check_proof(token, role, nonce, message):
+    if not token:
+        return True
+    return isinstance(message.get('proof'), str) and hmac.compare_digest(message['proof'], proof(token, role, nonce))
+
+
+async def open_connection(address):
+    if address.startswith('unix:'):
+        return await asyncio.open_unix_connection(address.removeprefix('unix:'))
+    host, port = address.rsplit(':', 1)
+    return await asyncio.open_connection(host, int(port))
+
+
+async def start_server(callback, address):
+    if address.startswith('unix:'):
+        return await asyncio.start_unix_server(callback, address.removeprefix('unix:'))
+    host, port = address.rsplit(':', 1)
+    return await asyncio.start_server(callback, host, int(port))
+
+
+def write_message(writer, message):
+    writer.write(json.dumps(message).encode() + b'\n')
+
+
+async def send(writer, message):
+    write_message(writer, message)
+    await writer.drain()
+
+
+async def read_messages(reader):
+    while line := await reader.readline():
+        with suppress(ValueError):
+            yield json.loads(line)
+
+
+class RemoteTask(BaseTask):
+    __slots__ = ('taskConfig', 'coordinator', 'done')
+
+    def __init__(self, name, taskConfig, coordinator):
+        super().__init__(name)
+        self.taskConfig = taskConfig
+        self.coordinator = coordinator
+        self.done = None
+
+    async def run(self):
+        await super().run()
+
+        self.message = 'waiting for a worker'
+        self.done = asyncio.get_running_loop().create_future()
+        await self.coordinator.submit(self)
+        try:
+            status, message = await self.done
+        finally:
+            self.done = None
+
+        if self.status == TaskStatus.CANCELLED:
+            return
+
+        self.message = message
+        await super().complete(status)
+
+    async def cancel(self):
+        await super().cancel()
+        await self.coordinator.cancel(self)
+        if self.done and not self.done.done():
+            self.done.set_result((TaskStatus.CANCELLED, self.message))
+
+
+class WorkerConnection:
+    def __init__(self, writer, name, capacity):
+        self.writer = writer
+        self.name = name
+        self.capacity = capacity
+        self.jobs = {}
+
+
+class Coordinator:
+    def __init__(self, address, token=None):
+        self.address = address
+        self.token = token
+        self.server = None
+        self.workers = []
+        self.queue = deque()
+        self.jobIds = itertools.count(1)
+
+    def wrap_task(self, task, taskConfig):
+        if taskConfig.get('remote', True) is False:
+            return task
+        return RemoteTask(task.name, taskConfig, self)
+
+    async def start(self):
+        if self.server is None:
+            self.server = asyncio.ensure_future(start_server(self.handle_worker, self.address))
+            logger.info(f'coordinator listening on {self.address}')
+            if not self.token and not self.address.startswith('unix:'):
+                logger.warning(f'{TOKEN_VARIABLE} is not set, any client reaching {self.address} can take tasks')
+        await self.server
+
+    async def close(self):
+        if self.server is None:
+            return
+        with suppress(OSError):
+            server = await self.server
+            server.close()
+            for worker in self.workers:
+                worker.writer.close()
+            await server.wait_closed()
+
+    async def submit(self, task: RemoteTask):
+        await self.start()
+        self.queue.append(task)
+        await self.dispatch()
+
+    async def cancel(self, task: RemoteTask):
+        with suppress(ValueError):
+            self.queue.remove(task)
+        for worker in self.workers:
+            for jobId, job in list(worker.jobs.items()):
+                if job is task:
+                    del worker.jobs[jobId]
+                    with suppress(ConnectionError):
+                        await send(worker.writer, {'type': 'cancel', 'id': jobId})
+        await self.dispatch()
+
+    async def dispatch(self):
+        while self.queue:
+            available = [w for w in self.workers if len(w.jobs) < w.capacity]
+            if not available:
+                return
+            worker = min(available, key=lambda w: len(w.jobs) / w.capacity)
+            task = self.queue.popleft()
+            jobId = next(self.jobIds)
+            worker.jobs[jobId] = task
+            task.message = f'sent to {worker.name}'
+            # a lost connection is handled by handle_worker, which reschedules the worker's jobs
+            with suppress(ConnectionError):
+                await send(worker.writer, {'type': 'run', 'id': jobId, 'task': task.taskConfig})
+
+    async def handle_worker(self, reader, writer):
+        messages = read_messages(reader)
+        worker = None
+        try:
+            nonce = secrets.token_hex(16)
+            await send(writer, {'type': 'challenge', 'nonce': nonce})
+            hello = await anext(messages, None)
+            if not hello or hello.get('type') != 'hello':
+                logger.warning(f'closing a connection that did not start with hello: {hello!r}')
+                return
+            if not check_proof(self.token, 'worker', nonce, hello):
+                logger.warning(f'closing the connection of {hello.get("name", "worker")}: wrong or missing token')
+                return
+            welcome = {'type': 'welcome'}
+            if self.token:
+                welcome['proof'] = proof(self.token, 'coordinator', hello.get('nonce', ''))
+            await send(writer, welcome)
+            worker = WorkerConnection(writer, hello.get('name', 'worker'), hello.get('capacity', 1))
+            self.workers.append(worker)
+            logger.info(f'worker {worker.name} connected with capacity {worker.capacity}')
+            await self.dispatch()
+
+            async for message in messages:
+                match message.get('type'):
+                    case 'update':
+                        if task := worker.jobs.get(message.get('id')):
+                            task.message = message['message']
+                            if message.get('startTime'):
+                                task.startTime = datetime.datetime.fromisoformat(message['startTime'])
+
+                    case 'done':
+                        if task := worker.jobs.pop(message.get('id'), None):
+                            if task.done and not task.done.done():
+                                task.done.set_result((TaskStatus[message['status']], message['message']))
+                            await self.dispatch()
+        except asyncio.CancelledError:
+            # the event loop is shutting down
+            pass
+        finally:
+            writer.close()
+            if worker:
+                self.workers.remove(worker)
+                logger.warning(f'worker {worker.name} disconnected, rescheduling {len(worker.jobs)} tasks')
+                for task in reversed(worker.jobs.values()):
+                    task.message = f'{worker.name} lost, rescheduling'
+                    self.queue.appendleft(task)
+                worker.jobs.clear()
+                await self.dispatch()
+
+
+async def run_job(writer, jobId, taskConfig, jobs):
+    try:
+        task = create_task(taskConfig)
+    except Exception as e:
+        with suppress(ConnectionError):
+            await send(writer, {'type': 'done', 'id': jobId, 'status': TaskStatus.ERROR.name, 'message': str(e)})
+        return
+
+    jobs[jobId] = task
+
+    def on_status_change(task, oldStatus, newStatus):
+        if newStatus == TaskStatus.RUNNING:
+            startTime = task.startTime.isoformat()
+            write_message(writer, {'type': 'update', 'id': jobId, 'message': task.message, 'startTime': startTime})
+
+    task.add_status_listener(on_status_change)
+    runner = asyncio.create_task(task.run())
+
+    message = None
+    while not runner.done():
+        await asyncio.wait([runner], timeout=1)
+        if task.message != message and not runner.done():
+            message = task.message
+            await send(writer, {'type': 'update', 'id': jobId, 'message': message})
+
+    del jobs[jobId]
+    status = task.status
+    try:
+        runner.result()
+    except Exception as e:
+        logger.exception(f'task {taskConfig.get("name", "")} failed')
+        status = TaskStatus.ERROR
+        task.message = str(e)
+    task.detach_state()
+    # the coordinator may be gone already, run_worker then cancels the remaining jobs
+    with suppress(ConnectionError):
+        await send(writer, {'type': 'done', 'id': jobId, 'status': status.name, 'message': task.message})
+
+
+async def handshake(reader, writer, name, capacity, token):
+    messages = read_messages(reader)
+    challenge = await anext(messages, None)
+    if not challenge or challenge.get('type') != 'challenge':
+        raise ConnectionError(f'unexpected first message from the coordinator: {challenge!r}')
+
+    nonce = secrets.token_hex(16)
+    hello = {'type': 'hello', 'name': name, 'capacity': capacity, 'nonce': nonce}
+    if token:
+        hello['proof'] = proof(token, 'worker', challenge.get('nonce', ''))
+    await send(writer, hello)
+
+    welcome = await anext(messages, None)
+    if not welcome or welcome.get('type') != 'welcome':
+        raise ConnectionError('the coordinator closed the connection, is the token the same on both sides?')
+    if not check_proof(token, 'coordinator', nonce, welcome):
+        raise ConnectionError('the coordinator did not prove it knows the token')
+    return messages
+
+
+async def run_worker(address, capacity=1, name=None, retryInterval=1, token=None):
+    name = name or f'worker-{os.getpid()}'
+
+    while True:
+        try:
+            reader, writer = await open_connection(address)
+            break
+        except OSError:
+            logger.debug(f'coordinator {address} not available, retrying in {retryInterval}s')
+            await asyncio.sleep(retryInterval)
+
+    try:
+        messages = await handshake(reader, writer, name, capacity, token)
+    except ConnectionError:
+        writer.close()
+        raise
+    logger.info(f'{name} connected to {address}')
+
+    jobs = {}
+    runners = set()
+    try:
+        async for message in messages:
+            match message['type']:
+                case 'run':
+                    runner = asyncio.create_task(run_job(writer, message['id'], message['task'], jobs))
+                    runners.add(runner)
+                    runner.add_done_callback(runners.discard)
+                case 'cancel':
+                    if task := jobs.get(message['id']):
+                        await task.cancel()
+    finally:
+        for task in list(jobs.values()):
+            await task.cancel()
+        for runner in list(runners):
+            runner.cancel()
+        writer.close()
@@ -0,0 +1,42 @@
+import json
+import logging
+import sys
+
+from .tasks import TaskStatus
+from .pipeline_model import PipelineModel
+
+
+logger = logging.getLogger('tasks_pipeline.headless')
+
+
+def task_event(taskModel):
+    task = taskModel.task
+    return {
+        'index': taskModel.taskIndex,
+        'name': taskModel.name,
+        'status': task.status.name,
+        'message': task.message,
+        'startTime': task.startTime.isoformat() if task.startTime else None,
+        'stopTime': task.stopTime.isoformat() if task.stopTime else None,
+    }
+
+
+def write_task_event(taskModel, out=sys.stdout):
+    out.write(json.dumps(task_event(taskModel)) + '\n')
+    out.flush()
+
+
+async def run_headless(model: PipelineModel):
+    model.watch_tasks(
+        lambda taskModel: taskModel.task.add_status_listener(
+            lambda task, oldStatus, newStatus, t=taskModel: write_task_event(t)
+        )
+    )
+
+    rootTask = model.rootTask
+    logger.info(f'start task: {rootTask.taskIndex=}, {rootTask.name=}')
+    await rootTask.task.execute()
+
+    if rootTask.task.status in (TaskStatus.COMPLETED, TaskStatus.DISABLED):
+        return 0
+    return 1
@@ -0,0 +1,71 @@
+import math
+import re
+
+
+VARIABLE_PATTERN = re.compile(r'\{(\w+)\}')
+
+
+def matrix_values(name, source):
+    if isinstance(source, list):
+        return source
+
+    if isinstance(source, dict) and 'range' in source:
+        bounds = source['range']
+        bounds = bounds if isinstance(bounds, list) else [bounds]
+        if not 1 <= len(bounds) <= 3 or not all(isinstance(b, int) for b in bounds):
+            raise ValueError(f'matrix {name}: range expected stop, [start, stop] or [start, stop, step]')
+        return range(*bounds)
+
+    if isinstance(source, dict) and 'file' in source:
+        with open(source['file'], 'r', encoding='utf-8') as f:
+            return [line for line in (line.strip() for line in f) if line]
+
+    raise ValueError(f'matrix {name}: expected a list, {{range: ...}} or {{file: ...}}, got {source!r}')
+
+
+def render(template, values):
+    if isinstance(template, str):
+        # a value made only of one variable keeps the type of the variable
+        if (m := VARIABLE_PATTERN.fullmatch(template)) and m[1] in values:
+            return values[m[1]]
+        # braces that are not matrix variables, like shell ${VAR} or awk '{print}', are left as they are
+        return VARIABLE_PATTERN.sub(lambda m: str(values[m[1]]) if m[1] in values else m[0], template)
+    if isinstance(template, dict):
+        return {k: render(v, values) for k, v in template.items()}
+    if isinstance(template, list):
+        return [render(v, values) for v in template]
+    return template
+
+
+class Matrix:
+    def __init__(self, variables, template, createTask=None, releaseTask=None):
+        if not isinstance(variables, dict) or not variables:
+            raise ValueError('matrix expected a mapping of variable names to values')
+        if not isinstance(template, dict) or 'tasks' in template or 'matrix' in template:
+            raise ValueError('matrix expected a "task" template with a single leaf task')
+        self.variables = [(name, matrix_values(name, source)) for name, source in variables.items()]
+        self.template = template
+        self.createTask = createTask
+        self.releaseTask = releaseTask
+
+    def __len__(self):
+        return math.prod(len(values) for _, values in self.variables)
+
+    def values(self, i):
+        values = {}
+        for name, variableValues in reversed(self.variables):
+            i, j = divmod(i, len(variableValues))
+            values[name] = variableValues[j]
+        return values
+
+    def task_config(self, i):
+        return render(self.template, self.values(i))
+
+    def __iter__(self):
+        # tasks are only created when they are pulled, so memory grows with the concurrency, not the size
+        for i in range(len(self)):
+            yield self.createTask(i, self.task_config(i))
+
+    def release(self, task):
+        if self.releaseTask:
+            self.releaseTask(task)
@@ -0,0 +1,190 @@
+import asyncio
+import bisect
+import contextlib
+import logging
+import os
+from collections import Counter, defaultdict
+
+from .tasks import TaskStatus
+from .pipeline_model import PipelineModel
+
+
+logger = logging.getLogger('tasks_pipeline.metrics')
+
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+FINAL_STATUSES = (TaskStatus.COMPLETED, TaskStatus.ERROR, TaskStatus.CANCELLED)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    return '{' + ','.join(f'{k}="{escape_label(v)}"' for k, v in labels.items()) + '}'
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for le, count in zip(BUCKETS + ('+Inf',), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{format_labels({**labels, "le": le})} {cumulative}'
+        yield f'{name}_sum{format_labels(labels)} {self.sum}'
+        yield f'{name}_count{format_labels(labels)} {self.count}'
+
+
+class Metrics:
+    def __init__(self, model: PipelineModel, port=None, host='127.0.0.1', file=None, interval=15):
+        self.model = model
+        self.port = port
+        self.host = host
+        self.file = file
+        self.interval = interval
+        self.server = None
+        self.writer = None
+
+        self.runSeconds = defaultdict(Histogram)
+        self.waitSeconds = defaultdict(Histogram)
+        self.finished = Counter()
+        self.inFlight = Counter()
+        self.lastRun = {}
+        self.lastWait = {}
+
+        model.watch_tasks(
+            lambda taskModel: taskModel.task.add_status_listener(
+                lambda task, oldStatus, newStatus, t=taskModel: self.on_status_change(t, oldStatus, newStatus)
+            )
+        )
+
+    def on_status_change(self, taskModel, oldStatus, newStatus):
+        task = taskModel.task
+        taskType = type(task).__name__
+
+        if newStatus == TaskStatus.RUNNING:
+            self.inFlight[taskType] += 1
+            if task.readyTime:
+                wait = max((task.startTime - task.readyTime).total_seconds(), 0)
+                self.waitSeconds[taskType].observe(wait)
+                # matrix rows are only counted by type, a gauge per row would grow with the size of the matrix
+                if task not in self.model.rows:
+                    self.lastWait[taskModel] = wait
+
+        elif newStatus in FINAL_STATUSES and not task.restored:
+            self.finished[taskType, newStatus.name] += 1
+            if oldStatus == TaskStatus.RUNNING:
+                self.inFlight[taskType] -= 1
+                duration = (task.stopTime - task.startTime).total_seconds()
+                self.runSeconds[taskType].observe(duration)
+                if task not in self.model.rows:
+                    self.lastRun[taskModel] = duration
+
+            if taskModel is self.model.rootTask and self.file:
+                self.write_file()
+
+    async def start(self):
+        # called from the running event loop before the pipeline starts, status listeners may fire before it
+        # (restoring a checkpoint does)
+        if self.port:
+            await self.serve()
+        if self.file:
+            self.writer = asyncio.create_task(self.write_periodically())
+
+    async def stop(self):
+        if self.writer:
+            self.writer.cancel()
+            self.writer = None
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    def render(self):
+        lines = [
+            '# HELP tasks_pipeline_task_run_seconds Time tasks spent running.',
+            '# TYPE tasks_pipeline_task_run_seconds histogram',
+        ]
+        for taskType, histogram in self.runSeconds.items():
+            lines.extend(histogram.lines('tasks_pipeline_task_run_seconds', {'type': taskType}))
+
+        lines.append('# HELP tasks_pipeline_task_wait_seconds Time tasks waited to start once they could run.')
+        lines.append('# TYPE tasks_pipeline_task_wait_seconds histogram')
+        for taskType, histogram in self.waitSeconds.items():
+            lines.extend(histogram.lines('tasks_pipeline_task_wait_seconds', {'type': taskType}))
+
+        lines.append('# HELP tasks_pipeline_tasks_finished_total Tasks that finished, by final status.')
+        lines.append('# TYPE tasks_pipeline_tasks_finished_total counter')
+        for (taskType, status), count in self.finished.items():
+            labels = format_labels({'type': taskType, 'status': status})
+            lines.append(f'tasks_pipeline_tasks_finished_total{labels} {count}')
+
+        lines.append('# HELP tasks_pipeline_tasks_in_flight Tasks currently running.')
+        lines.append('# TYPE tasks_pipeline_tasks_in_flight gauge')
+        for taskType, count in self.inFlight.items():
+            lines.append(f'tasks_pipeline_tasks_in_flight{format_labels({"type": taskType})} {count}')
+
+        for name, description, values in (
+            ('tasks_pipeline_task_last_run_seconds', 'How long the last run of each task took.', self.lastRun),
+            ('tasks_pipeline_task_last_wait_seconds', 'How long each task last waited to start.', self.lastWait),
+        ):
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} gauge')
+            for taskModel, value in values.items():
+                labels = {'index': taskModel.taskIndex, 'name': taskModel.name, 'type': type(taskModel.task).__name__}
+                lines.append(f'{name}{format_labels(labels)} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+    def write_file(self):
+        tmpFile = f'{self.file}.{os.getpid()}.tmp'
+        with open(tmpFile, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(tmpFile, self.file)
+
+    async def write_periodically(self):
+        while True:
+            self.write_file()
+            await asyncio.sleep(self.interval)
+
+    async def serve(self):
+        async def handle(reader, writer):
+            with contextlib.suppress(ConnectionError):
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                body = self.render().encode()
+                writer.write(
+                    b'HTTP/1.1 200 OK\r\n'
+                    b'Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n'
+                    + f'Content-Length: {len(body)}\r\n'.encode()
+                    + b'Connection: close\r\n\r\n'
+                    + body
+                )
+                await writer.drain()
+            writer.close()
+
+        self.server = await asyncio.start_server(handle, self.host, self.port)
+        logger.info(f'serving metrics on http://{self.host}:{self.port}/metrics')
+
+
+def setup_metrics(pipelineModel: PipelineModel):
+    metricsConfig = pipelineModel.config.get('metrics')
+    if not metricsConfig or not metricsConfig.get('enabled', True):
+        return None
+
+    return Metrics(
+        pipelineModel,
+        port=metricsConfig.get('port'),
+        host=metricsConfig.get('host', '127.0.0.1'),
+        file=metricsConfig.get('file'),
+        interval=metricsConfig.get('interval', 15),
+    )
@@ -0,0 +1,267 @@
+import array
+import asyncio
+import atexit
+import datetime
+import mmap
+import os
+import shutil
+import tempfile
+from contextlib import suppress
+
+from .tasks_logger import task_file_name
+
+
+outputSpool = None
+
+BLOCK_SIZE = 1024 * 1024
+# output is written in buffers of this size and flushed at this interval, so a pager sees it with a short delay
+BUFFER_SIZE = 64 * 1024
+FLUSH_INTERVAL = 0.5
+# blocks counted on every pager update, so the line numbers catch up without stalling the UI on huge files
+INDEX_BLOCKS_PER_UPDATE = 16
+CONTROL_CHARACTERS = {i: '?' for i in [*range(9), *range(10, 32), 127]}
+
+
+class OutputSpool:
+    def __init__(self, model, directory):
+        self.model = model
+        self.directory = directory
+        # the output file of each task that was looked up, None when it has none
+        self.paths = {}
+        self.files = set()
+        self.flushHandle = None
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, task):
+        return os.path.join(self.directory, task_file_name(self.model, task, '.out'))
+
+    def existing_path(self, task):
+        if task not in self.paths:
+            path = self.path(task)
+            self.paths[task] = path if os.path.exists(path) else None
+        return self.paths[task]
+
+    def open(self, task):
+        path = self.path(task)
+        # every run writes a new file, a pager may still map the previous one and reading a truncated map crashes
+        with suppress(FileNotFoundError):
+            os.remove(path)
+        file = open(path, 'wb', buffering=BUFFER_SIZE)
+        # only lookups are cached, matrix rows write a file each and are never looked up
+        if task in self.paths:
+            self.paths[task] = path
+        self.files.add(file)
+        if not self.flushHandle:
+            self.flushHandle = asyncio.get_running_loop().call_later(FLUSH_INTERVAL, self.flush)
+        return file
+
+    def flush(self):
+        # closing a file flushes it, the open ones are flushed until they are all closed
+        self.flushHandle = None
+        self.files = {file for file in self.files if not file.closed}
+        for file in self.files:
+            # a full disk is reported when the task closes the file
+            with suppress(OSError):
+                file.flush()
+        if self.files:
+            self.flushHandle = asyncio.get_running_loop().call_later(FLUSH_INTERVAL, self.flush)
+
+
+class SpoolReader:
+    # maps the file instead of reading it, the map is replaced when the file grows
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.map = None
+        self.size = 0
+        self.generation = 0
+        # number of lines in each complete block, counted lazily
+        self.blockLines = array.array('q')
+        self.refresh()
+
+    def refresh(self):
+        try:
+            inode = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return
+        if self.file and os.fstat(self.file.fileno()).st_ino != inode:
+            # the task ran again
+            self.close()
+        if not self.file:
+            self.file = open(self.path, 'rb')
+            self.generation += 1
+
+        size = os.fstat(self.file.fileno()).st_size
+        if size != self.size:
+            if self.map:
+                self.map.close()
+            self.map = mmap.mmap(self.file.fileno(), size, access=mmap.ACCESS_READ) if size else None
+            self.size = size
+
+    def close(self):
+        if self.map:
+            self.map.close()
+        if self.file:
+            self.file.close()
+        self.file = None
+        self.map = None
+        self.size = 0
+        self.blockLines = array.array('q')
+
+    def line_start(self, offset):
+        if offset <= 0 or not self.map:
+            return 0
+        return self.map.rfind(b'\n', 0, min(offset, self.size)) + 1
+
+    def next_line(self, offset):
+        i = self.map.find(b'\n', offset, self.size) if self.map else -1
+        return i + 1 if i != -1 and i + 1 < self.size else None
+
+    def previous_line(self, offset):
+        return self.line_start(offset - 1) if offset > 0 else None
+
+    def last_lines(self, count):
+        offset = self.line_start(self.size - 1)
+        for _ in range(count - 1):
+            if (previous := self.previous_line(offset)) is None:
+                break
+            offset = previous
+        return offset
+
+    def read_line(self, offset, maxLen):
+        if not self.map or offset >= self.size:
+            return ''
+        end = min(self.size, offset + maxLen * 4)
+        if (newline := self.map.find(b'\n', offset, end)) != -1:
+            end = newline
+        text = self.map[offset:end].decode('utf-8', errors='replace').expandtabs()
+        return text.rstrip('\r').translate(CONTROL_CHARACTERS)[:maxLen]
+
+    def find(self, pattern, offset, backwards=False):
+        if not self.map:
+            return None
+        if backwards:
+            i = self.map.rfind(pattern, 0, offset)
+        else:
+            i = self.map.find(pattern, offset, self.size)
+        return None if i == -1 else self.line_start(i)
+
+    def index_lines(self, maxBlocks):
+        start = len(self.blockLines)
+        for block in range(start, min(self.size // BLOCK_SIZE, start + maxBlocks)):
+            self.blockLines.append(self.map[block * BLOCK_SIZE : (block + 1) * BLOCK_SIZE].count(b'\n'))
+
+    def line_number(self, offset):
+        block = offset // BLOCK_SIZE
+        if block > len(self.blockLines):
+            return None
+        return sum(self.blockLines[:block]) + self.map[block * BLOCK_SIZE : offset].count(b'\n') + 1
+
+
+class Pager:
+    def __init__(self, path, title):
+        self.reader = SpoolReader(path)
+        self.title = title
+        self.generation = self.reader.generation
+        self.top = 0
+        self.follow = False
+        self.pageSize = 1
+        self.searchText = ''
+        self.message = ''
+
+    def close(self):
+        self.reader.close()
+
+    def update(self):
+        reader = self.reader
+        reader.refresh()
+        if reader.generation != self.generation:
+            self.generation = reader.generation
+            self.top = 0
+        if self.follow:
+            self.top = reader.last_lines(self.pageSize)
+        reader.index_lines(INDEX_BLOCKS_PER_UPDATE)
+
+    def scroll(self, lines):
+        reader = self.reader
+        if lines < 0:
+            self.follow = False
+            for _ in range(-lines):
+                if (previous := reader.previous_line(self.top)) is None:
+                    break
+                self.top = previous
+        else:
+            bottom = reader.last_lines(self.pageSize)
+            for _ in range(lines):
+                if self.top >= bottom or (nextLine := reader.next_line(self.top)) is None:
+                    break
+                self.top = nextLine
+
+    def home(self):
+        self.follow = False
+        self.top = 0
+
+    def end(self):
+        self.follow = True
+        self.top = self.reader.last_lines(self.pageSize)
+
+    def search(self, backwards=False):
+        if not self.searchText:
+            return
+        reader = self.reader
+        if backwards:
+            found = reader.find(self.searchText.encode(), self.top, backwards=True)
+        else:
+            start = reader.next_line(self.top)
+            found = reader.find(self.searchText.encode(), start) if start is not None else None
+        if found is None:
+            self.message = f'pattern not found: {self.searchText}'
+        else:
+            self.message = ''
+            self.follow = False
+            self.top = found
+
+    def visible_lines(self, maxLen):
+        reader = self.reader
+        lines = []
+        offset = self.top
+        while offset is not None and offset < reader.size and len(lines) < self.pageSize:
+            lines.append(reader.read_line(offset, maxLen))
+            offset = reader.next_line(offset)
+        return lines
+
+    def position(self):
+        reader = self.reader
+        if not reader.size:
+            return 'empty'
+        lineNumber = reader.line_number(self.top)
+        parts = [f'line {lineNumber}' if lineNumber else 'line ?', f'{reader.size:,} bytes']
+        if self.follow:
+            parts.append('following')
+        return '   '.join(parts)
+
+
+def setup_output_spool(pipelineModel, interactive=True):
+    global outputSpool
+    spoolConfig = pipelineModel.config.get('outputSpool') or {}
+    directory = spoolConfig.get('directory')
+    if not spoolConfig.get('enabled', True) or not (directory or interactive):
+        outputSpool = None
+        return None
+
+    if directory:
+        directory = datetime.datetime.now().strftime(directory)
+    else:
+        # only needed by the pager while the UI runs
+        directory = tempfile.mkdtemp(prefix='tasks_pipeline-')
+        atexit.register(shutil.rmtree, directory, ignore_errors=True)
+    outputSpool = OutputSpool(pipelineModel, directory)
+    return outputSpool
+
+
+def get_output_spool():
+    return outputSpool
+
+
+def get_output_path(task):
+    return outputSpool.existing_path(task) if outputSpool else None
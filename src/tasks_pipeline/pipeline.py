@@ -1,30 +1,44 @@
+import argparse
 import asyncio
-import curses
 import sys
 
-from .tasks_logger import setup_loggers
-from .view import display
-from .controller import process_input
+from .tasks_logger import setup_loggers, setup_task_logs
 from .pipeline_model import PipelineModel
 from .config import load_config
-from .curses_fix import mywrapper
+from .headless import run_headless
+from .result_cache import setup_result_cache
+from .checkpoint import setup_checkpoint
+from .process_pool import setup_process_pool, shutdown_process_pool
+from .distributed import Coordinator, get_token, run_worker
+from .resources import setup_resources
+from .tasks.dag_task import setup_dag_concurrency
+from .metrics import setup_metrics
+from .output_spool import setup_output_spool
+from .trace import setup_trace, load_spans, format_summary
 
 
-async def main(stdscr):
-    if len(sys.argv) < 2:
-        print('usage: tasks_pipeline configFile')
-        return
+async def run_pipeline(run, coordinator=None, metrics=None):
+    try:
+        if metrics:
+            await metrics.start()
+        return await run
+    finally:
+        if metrics:
+            await metrics.stop()
+        if coordinator:
+            await coordinator.close()
+
+
+async def main(stdscr, pipelineModel):
+    # the UI stack is only imported when the UI is used, headless runs and --validate start faster without it
+    import curses
+    from .view import display
+    from .controller import process_input
 
     curses.start_color()
     curses.use_default_colors()
     curses.curs_set(0)
 
-    config = load_config(sys.argv[1])
-
-    setup_loggers(config.get('logging'))
-
-    pipelineModel = PipelineModel(config)
-
     asyncio.create_task(display(stdscr, pipelineModel))
     await process_input(stdscr, pipelineModel)
 
@@ -34,9 +48,114 @@ async def main(stdscr):
     curses.endwin()
 
 
-@mywrapper
-def run_event_loop(stdscr):
-    asyncio.run(main(stdscr))
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(prog='tasks_pipeline', description='A curses CLI tasks pipeline')
+    parser.add_argument('configFile', nargs='?')
+    parser.add_argument(
+        '--headless',
+        action='store_true',
+        help='run the pipeline without the UI, writing a JSON line to stdout on every task status change',
+    )
+    parser.add_argument('--no-cache', action='store_true', help='ignore cached results and run every task')
+    parser.add_argument(
+        '--no-config-cache', action='store_true', help='parse and validate the config file even if it did not change'
+    )
+    parser.add_argument('--validate', action='store_true', help='check the config file and exit')
+    parser.add_argument('--checkpoint', metavar='FILE', help='journal task states to FILE so the run can be resumed')
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='mark the tasks completed in the checkpoint journal as done and continue from there',
+    )
+    parser.add_argument(
+        '--coordinator',
+        metavar='ADDRESS',
+        help='run leaf tasks on workers connecting to ADDRESS (host:port or unix:path). Workers run any command they'
+        ' are sent, so bind host:port to a trusted interface and set TASKS_PIPELINE_TOKEN to the same secret on the'
+        ' coordinator and its workers',
+    )
+    parser.add_argument('--worker', metavar='ADDRESS', help='run as a worker of the coordinator at ADDRESS')
+    parser.add_argument('--capacity', type=int, default=1, help='number of tasks a worker runs at the same time')
+    parser.add_argument('--trace', metavar='FILE', help='write one span per task to FILE when the pipeline finishes')
+    parser.add_argument('--trace-format', choices=('chrome', 'otlp'), help='chrome trace events (default) or OTLP JSON')
+    parser.add_argument(
+        '--analyze-trace',
+        metavar='FILE',
+        help='print the critical path and the idle slack per parallel group of a trace file and exit',
+    )
+
+    args = parser.parse_args(args)
+    if not args.configFile and not args.worker and not args.analyze_trace:
+        parser.error('the configFile argument is required')
+    return args
+
+
+def run_curses(pipelineModel, coordinator=None, metrics=None):
+    from .curses_fix import mywrapper
+
+    @mywrapper
+    def run(stdscr):
+        asyncio.run(run_pipeline(main(stdscr, pipelineModel), coordinator, metrics))
+
+    run()
+
+
+def run_event_loop():
+    args = parse_args()
+
+    if args.analyze_trace:
+        print(format_summary(load_spans(args.analyze_trace)))
+        return
+
+    if args.worker:
+        try:
+            asyncio.run(run_worker(args.worker, args.capacity, token=get_token()))
+        except ConnectionError as e:
+            sys.exit(f'worker: {e}')
+        finally:
+            shutdown_process_pool()
+        return
+
+    try:
+        config = load_config(args.configFile, not args.no_config_cache)
+    except ValueError as e:
+        sys.exit(str(e))
+
+    setup_loggers(config.get('logging'))
+    setup_result_cache(config.get('cache'), not args.no_cache)
+    setup_process_pool(config.get('processPool'))
+    setup_dag_concurrency(config.get('dag'))
+
+    coordinator = Coordinator(args.coordinator, get_token()) if args.coordinator else None
+    try:
+        pipelineModel = PipelineModel(config, coordinator.wrap_task if coordinator else None)
+        setup_resources(pipelineModel)
+    except ValueError as e:
+        sys.exit(f'invalid config:\n  {e}')
+
+    if args.validate:
+        print(f'{args.configFile}: {len(pipelineModel.tasks)} tasks, ok')
+        return
+    setup_task_logs(pipelineModel)
+    setup_output_spool(pipelineModel, not args.headless)
+    metrics = setup_metrics(pipelineModel)
+    trace = setup_trace(pipelineModel, args.trace, args.trace_format)
+
+    checkpointFile = args.checkpoint or (config.get('checkpoint') or {}).get('file')
+    if args.resume and not checkpointFile:
+        sys.exit('--resume needs a checkpoint file, set with --checkpoint or checkpoint.file in the config')
+    if checkpointFile:
+        setup_checkpoint(pipelineModel, checkpointFile, args.resume)
+
+    try:
+        if args.headless:
+            sys.exit(asyncio.run(run_pipeline(run_headless(pipelineModel), coordinator, metrics)))
+
+        run_curses(pipelineModel, coordinator, metrics)
+    finally:
+        shutdown_process_pool()
+        if trace and trace.summary:
+            print(trace.summary, file=sys.stderr)
 
 
 if __name__ == '__main__':
@@ -1,38 +1,140 @@
-import importlib
+import array
+import sys
+from bisect import bisect_left
 from enum import Enum, auto
+from functools import partial
 
 from .util import flatten_tasks
 from .task_model import TaskModel
+from .tasks import DagTask, ParallelTask, TaskStatus
+from .registry import get_task_class
+from .matrix import Matrix
+from .tasks.state_store import TaskStateStore
 
 
 class InputMode(Enum):
     NONE = auto()
     GET_TASK = auto()
     GET_COMMAND = auto()
+    PAGER = auto()
+    PAGER_SEARCH = auto()
 
 
 class PipelineModel:
-    def __init__(self, config):
+    def __init__(self, config, wrapLeafTask=None):
+        self.wrapLeafTask = wrapLeafTask
         self.load_config(config)
         self.scroll = 0
+        self.pageSize = 1
+        self.jumpToRow = None
 
     def selectTask(self, key):
-        matching = list(filter(lambda t: t.taskIndex == int(key), self.tasks))
-        self.selectedTask = matching[0] if matching else None
+        self.selectedTask = self.get_task(key)
+        if self.selectedTask:
+            self.revealTask(self.selectedTask)
+
+    def get_task(self, key):
+        if isinstance(key, int) or key.isnumeric():
+            # the indices grow in pre-order, with gaps where matrix rows are numbered
+            i = bisect_left(self.taskIndexes, int(key))
+            return self.tasks[i] if i < len(self.tasks) and self.taskIndexes[i] == int(key) else None
+
+        # the path is walked down from the root rather than indexed, a dict of paths would double the model's memory
+        taskModel = self.rootTask
+        for segment in filter(None, key.split('/')):
+            taskModel = next(
+                (child for i, child in enumerate(taskModel.subtasks) if (child.segment or str(i)) == segment), None
+            )
+            if not taskModel:
+                return None
+        return taskModel
+
+    def count_by_status(self, leavesOnly=True):
+        return self.states.count_by_status(leavesOnly=leavesOnly)
+
+    def update_disabled(self, taskModel):
+        update_disabled_depth(taskModel)
+
+    def watch_tasks(self, callback):
+        # called with every task of the model, then with each matrix row when ParallelTask creates it
+        for taskModel in self.tasks:
+            callback(taskModel)
+        self.taskWatchers.append(callback)
+
+    def create_row(self, matrixModel, i, taskConfig):
+        # rows are numbered after their matrix task, like in the config validation
+        taskModel = TaskModel(
+            str(taskConfig.get('name', '')),
+            create_leaf_task(taskConfig, matrixModel.task, self.wrapLeafTask),
+            taskIndex=matrixModel.taskIndex + 1 + i,
+            disabled=taskConfig.get('disabled', False),
+        )
+        taskModel.parentTask = matrixModel
+        # rows are not among the subtasks of the matrix task, so they keep their position as their segment
+        taskModel.segment = str(taskConfig.get('name') or i)
+        taskModel.level = matrixModel.level + 1
+        self.rows[taskModel.task] = taskModel
+        for watcher in self.taskWatchers:
+            watcher(taskModel)
+        return taskModel.task
+
+    def release_row(self, task):
+        # the row is dropped once it ran, its state moves out of the shared store so nothing keeps growing
+        self.rows.pop(task, None)
+        task.detach_state()
+
+    def get_task_model(self, task):
+        if task.stateStore is self.states and self.tasks[task.stateIndex].task is task:
+            return self.tasks[task.stateIndex]
+        return self.rows.get(task)
 
     def load_config(self, config=None):
         if config:
             self.config = config
 
-        self.rootTask = create_task_models(self.config['rootTask'])
+        self.rootTask = create_task_models(self.config['rootTask'], self.wrapLeafTask)
         add_display_info(self.rootTask)
 
         self.tasks = flatten_tasks(self.rootTask)
+        self.states = attach_state_store(self.tasks)
+        self.taskWatchers = []
+        # matrix rows that exist right now, they are not part of self.tasks
+        self.rows = {}
+        for taskModel in self.tasks:
+            if taskSource := getattr(taskModel.task, 'taskSource', None):
+                taskSource.createTask = partial(self.create_row, taskModel)
+                taskSource.releaseTask = self.release_row
+        self.taskIndexes = array.array('q', (t.taskIndex for t in self.tasks))
+        self.nameLen = min(max(len(t.displayPrefix + t.name) for t in self.tasks), 20)
+        self.indexLen = len(str(self.taskIndexes[-1]))
+        self.update_visible_tasks()
         self.title = self.config.get('title', 'Tasks Pipeline')
         self.inputMode: InputMode = InputMode.NONE
         self.hasUpdates: bool = True
         self.selectedTask = None
         self.selectedTaskText = ''
+        self.pager = None
+
+    def update_visible_tasks(self):
+        self.visibleTasks = flatten_tasks(self.rootTask, skipCollapsed=True)
+
+    def toggleCollapsed(self, taskModel):
+        if not taskModel.subtasks:
+            return
+        taskModel.collapsed = not taskModel.collapsed
+        self.update_visible_tasks()
+
+    def revealTask(self, taskModel):
+        collapsedAncestor = False
+        parent = taskModel.parentTask
+        while parent:
+            if parent.collapsed:
+                parent.collapsed = False
+                collapsedAncestor = True
+            parent = parent.parentTask
+        if collapsedAncestor:
+            self.update_visible_tasks()
+        self.jumpToRow = self.visibleTasks.index(taskModel)
 
     def scrollDown(self):
         self.scroll = 1
@@ -40,63 +142,180 @@ class PipelineModel:
     def scrollUp(self):
         self.scroll = -1
 
+    def scrollPageDown(self):
+        self.scroll = self.pageSize
+
+    def scrollPageUp(self):
+        self.scroll = -self.pageSize
+
+
+def create_task(task):
+    return get_task_class(task['type'])(task.get('name', ''), **task.get('params', {}))
 
-def create_task_models(rootTask):
+
+def create_leaf_task(task, parentTask, wrapLeafTask=None):
+    taskObject = create_task(task)
+    if wrapLeafTask:
+        taskObject = wrapLeafTask(taskObject, task)
+    taskObject.resources = task.get('resources')
+    taskObject.resourceGroup = parentTask
+    return taskObject
+
+
+def create_task_models(rootTask, wrapLeafTask=None):
     taskIndex = 0
 
     defaultNames = {
         'SequentialTask': '⭣',
         'ParallelTask': '⮆',
         'RetryTask': '↻',
+        'DagTask': '⋔',
     }
 
-    def create_task_model(task, parentTaskModel=None, disabled=None):
+    def create_task_model(task, parentTaskModel=None):
         nonlocal taskIndex
         taskIndex += 1
-        t = task['type']
-        t = t.split('.')
-        if len(t) == 1:
-            t = ['tasks_pipeline'] + t
-        mod, cls = t
-        mod = importlib.import_module(mod)
-        cls = getattr(mod, cls)
-
-        taskName = task.get('name', '')
-        if disabled is None:
-            disabled = task.get('disabled', False)
-        else:
-            disabled = False
+        cls = get_task_class(task['type'])
+
+        taskName = str(task.get('name', ''))
+        segment = taskName or None
+        disabled = task.get('disabled', False)
 
         if defaultName := defaultNames.get(task['type'], ''):
             taskName = f'{defaultName} {taskName}'
 
-        taskModel = TaskModel(taskName, cls(taskName, **task.get('params', {})), taskIndex=taskIndex, disabled=disabled)
+        try:
+            taskObject = cls(taskName, **task.get('params', {}))
+        except Exception as e:
+            # the config only checks the parameters, the task checks their values
+            raise ValueError(f'task {taskIndex} ({taskName}): {task["type"]} {e or type(e).__name__}') from e
+        if wrapLeafTask and not task.get('tasks') and 'matrix' not in task:
+            taskObject = wrapLeafTask(taskObject, task)
+        taskObject.resources = task.get('resources')
+        taskObject.resourceGroup = parentTaskModel.task if parentTaskModel else None
+
+        taskModel = TaskModel(taskName, taskObject, taskIndex=taskIndex, disabled=disabled)
+        taskModel.segment = segment
+        taskModel.collapsed = task.get('collapsed', False)
+        if task.get('tasks'):
+            taskModel.subtasks = []
+            taskObject.tasks = []
+
+        if 'matrix' in task:
+            if not isinstance(taskObject, ParallelTask) or task.get('tasks'):
+                raise ValueError(
+                    f'task {taskIndex} ({taskName}): "matrix" is only supported on a ParallelTask without tasks'
+                )
+            try:
+                taskObject.taskSource = Matrix(task['matrix'], task.get('task'))
+            except (OSError, ValueError) as e:
+                raise ValueError(f'task {taskIndex} ({taskName}): {e}') from e
+            # the rows are created by the ParallelTask as it pulls them, their indices are kept free
+            taskIndex += len(taskObject.taskSource)
 
         if parentTaskModel:
             taskModel.parentTask = parentTaskModel
             parentTaskModel.subtasks.append(taskModel)
             parentTaskModel.task.tasks.append(taskModel.task)
 
-        for child in task.get('tasks', []):
-            create_task_model(child, taskModel)
-
         return taskModel
 
-    return create_task_model(rootTask)
+    created = []
+    stack = [(rootTask, None)]
+    while stack:
+        task, parentTaskModel = stack.pop()
+        taskModel = create_task_model(task, parentTaskModel)
+        created.append((taskModel, task))
+        stack.extend((child, taskModel) for child in reversed(task.get('tasks', [])))
+
+    for taskModel, task in created:
+        resolve_needs(taskModel, task.get('tasks', []))
+
+    return created[0][0]
+
+
+def resolve_needs(taskModel, childrenConfig):
+    if not any(child.get('needs') for child in childrenConfig):
+        return
+
+    if not isinstance(taskModel.task, DagTask):
+        raise ValueError(
+            f'task {taskModel.taskIndex} ({taskModel.name}): "needs" is only supported on DagTask children'
+        )
+
+    tasksById = {}
+    for childModel, child in zip(taskModel.subtasks, childrenConfig):
+        if 'id' in child:
+            if child['id'] in tasksById:
+                raise ValueError(f'task {taskModel.taskIndex} ({taskModel.name}): duplicated id {child["id"]!r}')
+            tasksById[child['id']] = childModel.task
+
+    for childModel, child in zip(taskModel.subtasks, childrenConfig):
+        if not child.get('needs'):
+            continue
+        for need in child['needs']:
+            if need not in tasksById:
+                raise ValueError(f'task {childModel.taskIndex} ({childModel.name}): unknown id {need!r} in needs')
+        childModel.task.needs = [tasksById[need] for need in child['needs']]
 
+    dependents = {task: [] for task in taskModel.task.tasks}
+    for task in taskModel.task.tasks:
+        for need in task.needs:
+            dependents[need].append(task)
 
-def add_display_info(taskModel, level=0, parentPrefix='', lastChild=True):
-    prefix = ''
-    childrenPrefix = ''
-    if level == 0:
-        prefix = ''
-        childrenPrefix = ''
-    else:
-        prefix = parentPrefix + ('└' if lastChild else '├')
-        childrenPrefix = parentPrefix + (' ' if lastChild else '│')
-    taskModel.displayPrefix = prefix
+    remainingNeeds = {task: len(task.needs) for task in taskModel.task.tasks}
+    ready = [task for task, n in remainingNeeds.items() if n == 0]
+    while ready:
+        for dependent in dependents[ready.pop()]:
+            remainingNeeds[dependent] -= 1
+            if remainingNeeds[dependent] == 0:
+                ready.append(dependent)
 
-    if taskModel.subtasks:
+    if cycle := [childModel.name for childModel in taskModel.subtasks if remainingNeeds[childModel.task] > 0]:
+        raise ValueError(f'task {taskModel.taskIndex} ({taskModel.name}): dependency cycle between {", ".join(cycle)}')
+
+
+def add_display_info(rootTask):
+    rootTask.displayPrefix = ''
+    rootTask.level = 0
+
+    stack = [(rootTask, '')]
+    while stack:
+        taskModel, childrenPrefix = stack.pop()
         lastChildIdx = len(taskModel.subtasks) - 1
         for e, child in enumerate(taskModel.subtasks):
-            add_display_info(child, level + 1, childrenPrefix, e == lastChildIdx)
+            lastChild = e == lastChildIdx
+            # siblings share their prefix, interning keeps one string for them instead of one per task
+            child.displayPrefix = sys.intern(childrenPrefix + ('└' if lastChild else '├'))
+            child.level = taskModel.level + 1
+            stack.append((child, childrenPrefix + (' ' if lastChild else '│')))
+
+    update_disabled_depth(rootTask)
+
+
+def update_disabled_depth(taskModel):
+    # the depth of the top-most disabled task among the ancestors of each task, so the view can grey out the
+    # part of the tree lines below it without walking up to the root for every row
+    parentDepth = taskModel.parentTask.disabledDepth if taskModel.parentTask else None
+    stack = [(taskModel, parentDepth)]
+    while stack:
+        taskModel, parentDepth = stack.pop()
+        if parentDepth is None and taskModel.task.status == TaskStatus.DISABLED:
+            parentDepth = taskModel.level
+        taskModel.disabledDepth = parentDepth
+        stack.extend((child, parentDepth) for child in taskModel.subtasks)
+
+
+def attach_state_store(tasks):
+    # tasks are in pre-order, so every subtree is a contiguous range of the store
+    store = TaskStateStore(len(tasks))
+    for i, taskModel in enumerate(tasks):
+        taskModel.task.attach_state(store, i)
+        if taskModel.subtasks:
+            store.mark_container(i)
+
+    for taskModel in tasks:
+        if taskModel.parentTask:
+            store.set_parent(taskModel.task.stateIndex, taskModel.parentTask.task.stateIndex)
+    store.count_leaves()
+    return store
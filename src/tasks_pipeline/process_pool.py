@@ -0,0 +1,29 @@
+maxWorkers = None
+processPool = None
+
+
+def setup_process_pool(processPoolConfig):
+    global maxWorkers
+    maxWorkers = (processPoolConfig or {}).get('maxWorkers')
+
+
+def get_process_pool():
+    global processPool
+    if processPool is None:
+        from concurrent.futures import ProcessPoolExecutor
+
+        processPool = ProcessPoolExecutor(max_workers=maxWorkers)
+    return processPool
+
+
+def shutdown_process_pool():
+    global processPool
+    if processPool is None:
+        return
+    processPool.shutdown(wait=False, cancel_futures=True)
+    processPool = None
+    # calls that are still running would otherwise keep the interpreter from exiting
+    import multiprocessing
+
+    for process in multiprocessing.active_children():
+        process.terminate()
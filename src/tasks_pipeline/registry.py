@@ -0,0 +1,47 @@
+import importlib
+import logging
+
+from .tasks import TASK_MODULES
+
+
+logger = logging.getLogger('tasks_pipeline.registry')
+
+
+ENTRY_POINT_GROUP = 'tasks_pipeline.tasks'
+
+taskTypes = {}
+entryPoints = None
+
+
+def register_task_type(name, cls):
+    taskTypes[name] = cls
+
+
+def get_entry_points():
+    global entryPoints
+    if entryPoints is None:
+        # scanning the installed distributions is slow, only done when a config uses a type that is not built in
+        from importlib import metadata
+
+        entryPoints = {ep.name: ep for ep in metadata.entry_points(group=ENTRY_POINT_GROUP)}
+    return entryPoints
+
+
+def get_task_class(taskType):
+    if cls := taskTypes.get(taskType):
+        return cls
+
+    if taskType in TASK_MODULES and taskType != 'TaskStatus':
+        cls = getattr(importlib.import_module('.tasks', __package__), taskType)
+    elif '.' in taskType:
+        # a class given by its import path, e.g. my_package.tasks.MyTask
+        mod, name = taskType.rsplit('.', 1)
+        cls = getattr(importlib.import_module(mod), name)
+    elif entryPoint := get_entry_points().get(taskType):
+        logger.debug(f'loading task type {taskType} from {entryPoint.value}')
+        cls = entryPoint.load()
+    else:
+        raise ValueError(f'unknown task type {taskType!r}')
+
+    taskTypes[taskType] = cls
+    return cls
@@ -0,0 +1,128 @@
+import asyncio
+from collections import OrderedDict, deque
+
+
+resourceScheduler = None
+
+
+class ResourceScheduler:
+    def __init__(self, capacities):
+        self.capacities = {name: float(amount) for name, amount in capacities.items()}
+        self.available = dict(self.capacities)
+        self.groups = OrderedDict()
+        self.waiting = {}
+
+    def check(self, name, resources, held={}):
+        for resource, amount in resources.items():
+            if resource not in self.capacities:
+                raise ValueError(f'task {name}: unknown resource {resource!r}')
+            if amount > self.capacities[resource]:
+                raise ValueError(
+                    f'task {name}: requests {amount} {resource} but the pool only has {self.capacities[resource]:g}'
+                )
+            # the ancestors keep what they hold until this task finishes, so it would wait forever
+            if held.get(resource, 0) + amount > self.capacities[resource]:
+                raise ValueError(
+                    f'task {name}: requests {amount} {resource} while its parent tasks hold {held[resource]:g}'
+                    f' of the {self.capacities[resource]:g} in the pool'
+                )
+
+    def is_waiting(self, task):
+        return task in self.waiting
+
+    def fits(self, resources):
+        return all(self.available[resource] >= amount for resource, amount in resources.items())
+
+    async def acquire(self, task):
+        if not self.groups and self.fits(task.resources):
+            self._take(task.resources)
+            return True
+
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[task] = future
+        self.groups.setdefault(task.resourceGroup, deque()).append(task)
+        try:
+            return await future
+        except asyncio.CancelledError:
+            if future.done() and future.result():
+                self.release(task)
+            else:
+                self.withdraw(task)
+            raise
+
+    def release(self, task):
+        for resource, amount in task.resources.items():
+            self.available[resource] += amount
+        self._admit()
+
+    def withdraw(self, task):
+        future = self.waiting.pop(task, None)
+        if future is None:
+            return
+        queue = self.groups[task.resourceGroup]
+        queue.remove(task)
+        if not queue:
+            del self.groups[task.resourceGroup]
+        if not future.done():
+            future.set_result(False)
+        self._admit()
+
+    def _take(self, resources):
+        for resource, amount in resources.items():
+            self.available[resource] -= amount
+
+    def _admit(self):
+        # groups (the waiting tasks' parents) take turns, and a request that does not fit yet
+        # blocks the ones behind it so large requests are not starved by smaller ones
+        while self.groups:
+            group, queue = next(iter(self.groups.items()))
+            task = queue[0]
+            if not self.fits(task.resources):
+                return
+            queue.popleft()
+            if queue:
+                self.groups.move_to_end(group)
+            else:
+                del self.groups[group]
+            self._take(task.resources)
+            self.waiting.pop(task).set_result(True)
+
+
+def setup_resources(pipelineModel):
+    global resourceScheduler
+    capacities = pipelineModel.config.get('resources')
+    resourceScheduler = ResourceScheduler(capacities) if capacities else None
+
+    # what the ancestors of each task hold while it runs, the tasks are in pre-order so parents come first
+    held = {}
+    for taskModel in pipelineModel.tasks:
+        parentHeld = held.get(taskModel.parentTask, {})
+        ownResources = taskModel.task.resources
+        if ownResources:
+            name = f'{taskModel.taskIndex} ({taskModel.name})'
+            if not resourceScheduler:
+                raise ValueError(f'task {name}: requests resources but none are declared')
+            resourceScheduler.check(name, ownResources, parentHeld)
+        held[taskModel] = add_resources(parentHeld, ownResources)
+        if taskSource := getattr(taskModel.task, 'taskSource', None):
+            # tasks generated by a matrix all request what the template requests
+            rowResources = taskSource.template.get('resources')
+            if rowResources:
+                name = f'{taskModel.taskIndex} ({taskModel.name})'
+                if not resourceScheduler:
+                    raise ValueError(f'task {name}: requests resources but none are declared')
+                resourceScheduler.check(name, rowResources, held[taskModel])
+
+
+def add_resources(a, b):
+    if not b:
+        return a
+    return {resource: a.get(resource, 0) + b.get(resource, 0) for resource in a.keys() | b.keys()}
+
+
+def get_resource_scheduler():
+    return resourceScheduler
+
+
+def is_waiting_for_resources(task):
+    return bool(resourceScheduler) and resourceScheduler.is_waiting(task)
@@ -0,0 +1,125 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+
+logger = logging.getLogger('tasks_pipeline.result_cache')
+
+
+resultCache = None
+
+
+class ResultCache:
+    def __init__(self, directory='.tasks_pipeline_cache', maxSize=100 * 1024 * 1024, inputHash='content'):
+        if inputHash not in ('content', 'mtime'):
+            raise ValueError(f'cache inputHash must be "content" or "mtime", got {inputHash!r}')
+        self.directory = directory
+        self.maxSize = int(maxSize)
+        self.inputHash = inputHash
+        # the size of the directory is counted once, then kept up to date by put and evict
+        self.totalSize = None
+        self.lock = threading.Lock()
+
+    def key(self, cmd, inputs=(), env=(), extra=()):
+        h = hashlib.sha256()
+        h.update(json.dumps([cmd, list(extra)]).encode())
+
+        for path in sorted({p for pattern in inputs for p in glob.glob(pattern, recursive=True)}):
+            if not os.path.isfile(path):
+                continue
+            h.update(path.encode())
+            if self.inputHash == 'content':
+                with open(path, 'rb') as f:
+                    while chunk := f.read(1024 * 1024):
+                        h.update(chunk)
+            else:
+                st = os.stat(path)
+                h.update(f'{st.st_mtime_ns}:{st.st_size}'.encode())
+
+        for name in sorted(env):
+            h.update(json.dumps([name, os.environ.get(name)]).encode())
+
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.json')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                entry = json.loads(f.read().decode('utf-8'))
+        except (OSError, ValueError):
+            return None
+        os.utime(path)
+        return entry
+
+    def put(self, key, entry):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmpPath = f'{path}.{os.getpid()}.tmp'
+        data = json.dumps({**entry, 'time': time.time()}).encode('utf-8')
+        with open(tmpPath, 'wb') as f:
+            f.write(data)
+
+        with self.lock:
+            try:
+                oldSize = os.stat(path).st_size
+            except OSError:
+                oldSize = 0
+            os.replace(tmpPath, path)
+            if self.totalSize is None:
+                self.totalSize = self.directory_size()
+            else:
+                self.totalSize += len(data) - oldSize
+            if self.totalSize > self.maxSize:
+                self.evict()
+
+    def directory_size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def entries(self):
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, '*', '*.json')):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def evict(self):
+        # down to 90% of maxSize, so the directory is not scanned again on the next put
+        entries = sorted(self.entries())
+        totalSize = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if totalSize <= self.maxSize * 0.9:
+                break
+            logger.debug(f'evicting cache entry {path}')
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            totalSize -= size
+        self.totalSize = totalSize
+
+
+def setup_result_cache(cacheConfig, enabled=True):
+    global resultCache
+    if not enabled or not cacheConfig or not cacheConfig.get('enabled', True):
+        resultCache = None
+        return
+
+    resultCache = ResultCache(
+        cacheConfig.get('dir', '.tasks_pipeline_cache'),
+        cacheConfig.get('maxSize', 100 * 1024 * 1024),
+        cacheConfig.get('inputHash', 'content'),
+    )
+
+
+def get_result_cache():
+    return resultCache
@@ -2,21 +2,54 @@ from .tasks import TaskStatus
 
 
 class TaskModel:
+    __slots__ = (
+        'task',
+        'parentTask',
+        'subtasks',
+        'taskIndex',
+        'displayPrefix',
+        'segment',
+        'level',
+        'disabledDepth',
+        'name',
+        'collapsed',
+    )
+
     def __init__(self, name, task, taskIndex=None, disabled=False):
         if disabled:
             task.status = TaskStatus.DISABLED
         self.task = task
         self.parentTask = None
-        self.subtasks = []
+        # leaves share the empty tuple, the model gives a list to the tasks with children
+        self.subtasks = ()
         self.taskIndex = taskIndex
         self.displayPrefix = ''
-        self.win = None
+        # the name from the config, the path uses the position in the parent for tasks without one
+        self.segment = None
+        self.level = 0
+        self.disabledDepth = None
         self.name = name
+        self.collapsed = False
 
-    def get_ancestry_disabled_status(self):
-        enabledStatus = [self.task.status == TaskStatus.DISABLED]
+    @property
+    def path(self):
+        # built when it is asked for, a string per task would cost more than the task itself on large pipelines
+        segments = []
+        taskModel = self
+        while taskModel.parentTask:
+            segments.append(taskModel.segment or str(taskModel.parentTask.subtasks.index(taskModel)))
+            taskModel = taskModel.parentTask
+        return '/'.join(reversed(segments))
 
-        if self.parentTask:
-            enabledStatus.extend(self.parentTask.get_ancestry_disabled_status())
+    @property
+    def statusCounts(self):
+        # the leaves of the subtree by status value, kept up to date by the state store
+        return self.task.stateStore.leaf_counts(self.task.stateIndex)
 
-        return enabledStatus
+    def aggregate_message(self):
+        counts = self.statusCounts
+        parts = [f'{counts[TaskStatus.COMPLETED.value]}/{sum(counts)} completed']
+        for status in (TaskStatus.RUNNING, TaskStatus.ERROR, TaskStatus.CANCELLED, TaskStatus.DISABLED):
+            if counts[status.value]:
+                parts.append(f'{counts[status.value]} {status.name.lower()}')
+        return ', '.join(parts)
@@ -1,21 +1,31 @@
-from .base_task import BaseTask
-from .task_status import TaskStatus
-from .wait_task import WaitUntilTask
-from .wait_task import WaitForTask
-from .parallel_task import ParallelTask
-from .sequential_tasks import SequentialTask
-from .run_process_task import RunProcessTask
-from .retry_task import RetryTask
-from .port_connectivity_task import PortConnectivityTask
+import importlib
 
-__all__ = [
-    'BaseTask',
-    'TaskStatus',
-    'WaitUntilTask',
-    'WaitForTask',
-    'ParallelTask',
-    'SequentialTask',
-    'RunProcessTask',
-    'RetryTask',
-    'PortConnectivityTask',
-]
+
+# task classes are imported on first use so importing the package stays cheap
+TASK_MODULES = {
+    'BaseTask': 'base_task',
+    'TaskStatus': 'task_status',
+    'WaitUntilTask': 'wait_task',
+    'WaitForTask': 'wait_task',
+    'ParallelTask': 'parallel_task',
+    'SequentialTask': 'sequential_tasks',
+    'RunProcessTask': 'run_process_task',
+    'RetryTask': 'retry_task',
+    'PortConnectivityTask': 'port_connectivity_task',
+    'DagTask': 'dag_task',
+    'PythonCallableTask': 'python_callable_task',
+}
+
+__all__ = list(TASK_MODULES)
+
+
+def __getattr__(name):
+    if module := TASK_MODULES.get(name):
+        value = getattr(importlib.import_module(f'.{module}', __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
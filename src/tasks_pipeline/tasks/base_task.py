@@ -1,29 +1,131 @@
 from .task_status import TaskStatus
+from .state_store import TaskStateStore, defaultStore, to_datetime, to_timestamp
+from ..resources import get_resource_scheduler
 import datetime
 
 
 class BaseTask(object):
+    # status and times live in a TaskStateStore, the pipeline model moves its tasks into one store of its own
+    __slots__ = (
+        'stateStore',
+        'stateIndex',
+        'name',
+        'statusListeners',
+        'message',
+        'tasks',
+        'needs',
+        'restored',
+        'resources',
+        'resourceGroup',
+    )
+
     def __init__(self, name):
+        self.stateStore = defaultStore
+        self.stateIndex = defaultStore.allocate()
         self.name = name
-        self.status = TaskStatus.NOT_STARTED
+        # leaves are most of a large pipeline, they share empty tuples until something needs a list
+        self.statusListeners = ()
         self.message = ''
-        self.startTime = None
-        self.stopTime = None
-        self.tasks = []
+        self.tasks = ()
+        self.needs = ()
+        self.restored = False
+        self.resources = None
+        self.resourceGroup = None
+
+    def attach_state(self, store, index):
+        store.copy(index, self.stateStore, self.stateIndex)
+        if self.stateStore is defaultStore:
+            defaultStore.release(self.stateIndex)
+        self.stateStore = store
+        self.stateIndex = index
+
+    def detach_state(self):
+        # gives the slot in the default store back, for tasks outside a model once they are done
+        if self.stateStore is defaultStore:
+            self.attach_state(TaskStateStore(1), 0)
+
+    def add_status_listener(self, listener):
+        if not self.statusListeners:
+            self.statusListeners = []
+        self.statusListeners.append(listener)
+
+    @property
+    def status(self):
+        return self.stateStore.get_status(self.stateIndex)
+
+    @status.setter
+    def status(self, status):
+        oldStatus = self.status
+        self.stateStore.set_status(self.stateIndex, status)
+        if oldStatus != status:
+            for listener in self.statusListeners:
+                listener(self, oldStatus, status)
+
+    @property
+    def startTime(self):
+        return to_datetime(self.stateStore.startTime[self.stateIndex])
+
+    @startTime.setter
+    def startTime(self, value):
+        self.stateStore.startTime[self.stateIndex] = to_timestamp(value)
+
+    @property
+    def stopTime(self):
+        return to_datetime(self.stateStore.stopTime[self.stateIndex])
+
+    @stopTime.setter
+    def stopTime(self, value):
+        self.stateStore.stopTime[self.stateIndex] = to_timestamp(value)
+
+    @property
+    def readyTime(self):
+        return to_datetime(self.stateStore.readyTime[self.stateIndex])
+
+    @readyTime.setter
+    def readyTime(self, value):
+        self.stateStore.readyTime[self.stateIndex] = to_timestamp(value)
+
+    async def execute(self):
+        if self.readyTime is None:
+            self.readyTime = datetime.datetime.now()
+
+        scheduler = get_resource_scheduler() if self.resources else None
+        if scheduler:
+            self.message = 'waiting for resources'
+            granted = await scheduler.acquire(self)
+            self.message = ''
+            if granted and self.status == TaskStatus.CANCELLED:
+                # cancelled between getting the resources and resuming
+                scheduler.release(self)
+                granted = False
+            if not granted:
+                self.readyTime = None
+                return
+
+        try:
+            await self.run()
+        finally:
+            self.readyTime = None
+            if scheduler:
+                scheduler.release(self)
 
     async def run(self):
-        self.status = TaskStatus.RUNNING
+        # a restored task that runs again, like the root task on resume, is not restored anymore
+        self.restored = False
         self.startTime = datetime.datetime.now()
         self.stopTime = None
+        self.status = TaskStatus.RUNNING
 
     async def cancel(self):
-        for task in self.tasks:
+        if self.resources and (scheduler := get_resource_scheduler()):
+            scheduler.withdraw(self)
+        for task in list(self.tasks):
             await task.cancel()
-        self.status = TaskStatus.CANCELLED
         self.stopTime = datetime.datetime.now()
         if not self.startTime:
             self.startTime = self.stopTime
+        self.status = TaskStatus.CANCELLED
 
     async def complete(self, status=TaskStatus.COMPLETED):
-        self.status = status
         self.stopTime = datetime.datetime.now()
+        self.status = status
@@ -0,0 +1,92 @@
+import asyncio
+import datetime
+from collections import deque
+
+from .base_task import BaseTask
+from .task_status import TaskStatus
+
+
+# leaf tasks of all the DagTasks of the pipeline run at most dag.maxConcurrency at a time
+dagSlots = None
+
+
+def setup_dag_concurrency(dagConfig):
+    global dagSlots
+    maxConcurrency = (dagConfig or {}).get('maxConcurrency')
+    dagSlots = asyncio.Semaphore(maxConcurrency) if maxConcurrency else None
+
+
+class DagTask(BaseTask):
+    __slots__ = ('maxConcurrency',)
+
+    def __init__(self, name, maxConcurrency=None):
+        super().__init__(name)
+        self.maxConcurrency = maxConcurrency
+
+    async def run(self):
+        await super().run()
+
+        self.message = ''
+        dependents = {task: [] for task in self.tasks}
+        remainingNeeds = {}
+        for task in self.tasks:
+            remainingNeeds[task] = len(task.needs)
+            for need in task.needs:
+                dependents[need].append(task)
+
+        ready = deque(task for task in self.tasks if not task.needs)
+        for task in ready:
+            task.readyTime = self.startTime
+        running = set()
+
+        def skip_dependents(task, failedTask):
+            for dependent in dependents[task]:
+                if remainingNeeds[dependent] >= 0:
+                    remainingNeeds[dependent] = -1
+                    dependent.message = f'skipped: {failedTask.name} did not complete'
+                    skip_dependents(dependent, failedTask)
+
+        def task_done(task):
+            if task.status not in (TaskStatus.COMPLETED, TaskStatus.DISABLED):
+                skip_dependents(task, task)
+                return
+            for dependent in dependents[task]:
+                remainingNeeds[dependent] -= 1
+                if remainingNeeds[dependent] == 0:
+                    dependent.readyTime = datetime.datetime.now()
+                    ready.append(dependent)
+
+        async def run_task(task):
+            # only leaves take a slot, a nested DagTask holding one while its children wait for theirs could deadlock
+            if dagSlots is None or task.tasks:
+                await task.execute()
+                return task
+            async with dagSlots:
+                if task.status not in (TaskStatus.DISABLED, TaskStatus.CANCELLED):
+                    await task.execute()
+            return task
+
+        while ready or running:
+            while ready and self.status != TaskStatus.CANCELLED:
+                if self.maxConcurrency and len(running) >= self.maxConcurrency:
+                    break
+                task = ready.popleft()
+                if task.status in (TaskStatus.DISABLED, TaskStatus.CANCELLED) or task.restored:
+                    task_done(task)
+                    continue
+                running.add(asyncio.create_task(run_task(task)))
+
+            if not running:
+                break
+
+            done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                task_done(future.result())
+
+        if self.status == TaskStatus.CANCELLED:
+            return
+
+        if any((task for task in self.tasks if task.status not in (TaskStatus.COMPLETED, TaskStatus.DISABLED))):
+            await super().complete(TaskStatus.ERROR)
+        else:
+            await super().complete()
@@ -1,35 +1,94 @@
 import asyncio
+from collections import Counter
+
 from .base_task import BaseTask
 from .task_status import TaskStatus
 
 
 class ParallelTask(BaseTask):
-    def __init__(self, name, maxConcurrency=None):
+    __slots__ = ('maxConcurrency', 'failFast', 'taskSource', 'counts')
+
+    def __init__(self, name, maxConcurrency=None, failFast=False):
         super().__init__(name)
         self.maxConcurrency = maxConcurrency
+        self.failFast = failFast
+        # a sized iterable creating the tasks as they are pulled, used instead of self.tasks when set
+        self.taskSource = None
+        self.counts = Counter()
+
+    def progress_message(self, total):
+        parts = [f'{self.counts[TaskStatus.COMPLETED]}/{total} completed']
+        if self.tasks:
+            parts.append(f'{len(self.tasks)} running')
+        for status in (TaskStatus.ERROR, TaskStatus.CANCELLED, TaskStatus.DISABLED):
+            if self.counts[status]:
+                parts.append(f'{self.counts[status]} {status.name.lower()}')
+        return ', '.join(parts)
 
     async def run(self):
         await super().run()
 
-        if self.maxConcurrency:
-            semaphore = asyncio.Semaphore(self.maxConcurrency)
+        self.message = ''
+        generated = self.taskSource is not None
+        tasks = self.taskSource if generated else self.tasks
+        total = len(tasks)
+        pending = iter(tasks)
+        inFlight = set()
+        failed = False
+        self.counts.clear()
+        if generated:
+            self.tasks = []
 
-            async def f(task):
-                async with semaphore:
-                    if self.status in (TaskStatus.DISABLED, TaskStatus.CANCELLED):
-                        return
-                    return await task.run()
+        async def worker():
+            nonlocal failed
+            for task in pending:
+                if failed or self.status in (TaskStatus.DISABLED, TaskStatus.CANCELLED):
+                    if generated:
+                        self.taskSource.release(task)
+                    return
+                if task.status in (TaskStatus.DISABLED, TaskStatus.CANCELLED) or task.restored:
+                    if generated:
+                        # restored from a checkpoint or disabled in the template
+                        self.counts[task.status] += 1
+                        self.taskSource.release(task)
+                    continue
 
-        else:
+                task.readyTime = self.startTime
+                inFlight.add(task)
+                if generated:
+                    # generated tasks are children only while they run, so cancel() reaches them
+                    self.tasks.append(task)
+                    self.message = self.progress_message(total)
+                try:
+                    await task.execute()
+                finally:
+                    inFlight.discard(task)
+                    if generated:
+                        self.tasks.remove(task)
+                        self.counts[task.status] += 1
+                        if not failed:
+                            self.message = self.progress_message(total)
+
+                if self.failFast and task.status == TaskStatus.ERROR and not failed:
+                    failed = True
+                    self.message = f'{task.name} failed, cancelling the remaining tasks'
+                    # tasks still queued for a resource pool, or granted it but not resumed yet, are in flight too.
+                    # they are cancelled before yielding to the loop, so none of them starts
+                    for t in [t for t in inFlight if t.status == TaskStatus.NOT_STARTED]:
+                        await t.cancel()
+                    await asyncio.gather(*[t.cancel() for t in list(inFlight) if t.status == TaskStatus.RUNNING])
+
+                if generated:
+                    self.taskSource.release(task)
 
-            async def f(task):
-                return await task.run()
+        numWorkers = min(self.maxConcurrency or total, total)
+        await asyncio.gather(*[worker() for _ in range(numWorkers)])
 
-        await asyncio.gather(
-            *[f(task) for task in self.tasks if task.status not in (TaskStatus.DISABLED, TaskStatus.CANCELLED)]
-        )
+        if self.status == TaskStatus.CANCELLED:
+            return
 
-        if any((task for task in self.tasks if task.status not in (TaskStatus.COMPLETED, TaskStatus.DISABLED))):
+        statuses = self.counts if generated else (task.status for task in self.tasks)
+        if failed or any(status not in (TaskStatus.COMPLETED, TaskStatus.DISABLED) for status in statuses):
             await super().complete(TaskStatus.ERROR)
         else:
             await super().complete()
@@ -1,5 +1,7 @@
+import asyncio
 import logging
-import socket
+import time
+from contextlib import suppress
 
 from .base_task import BaseTask
 from .task_status import TaskStatus
@@ -8,25 +10,61 @@ from .task_status import TaskStatus
 logger = logging.getLogger('tasks_pipeline.port_connectivity_task')
 
 
+async def probe_port(host, port, timeout):
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    with suppress(OSError):
+        await writer.wait_closed()
+    return True
+
+
+def split_host(host):
+    # the port is after the last ':', an IPv6 address is written in brackets like [::1]:22
+    ipAddress, port = host.rsplit(':', 1)
+    return ipAddress.removeprefix('[').removesuffix(']'), port
+
+
 class PortConnectivityTask(BaseTask):
-    def __init__(self, name, hosts=[]):
+    __slots__ = ('hosts', 'timeout', 'maxConcurrency', 'waitUntilUp', 'deadline', 'retryInterval')
+
+    def __init__(self, name, hosts=[], timeout=3, maxConcurrency=100, waitUntilUp=False, deadline=60, retryInterval=1):
         super().__init__(name)
         self.hosts = hosts
+        self.timeout = float(timeout)
+        self.maxConcurrency = maxConcurrency
+        self.waitUntilUp = waitUntilUp
+        self.deadline = float(deadline)
+        self.retryInterval = float(retryInterval)
 
     async def run(self):
         await super().run()
 
-        connected = 0
-        for host in self.hosts:
-            ipAddress, port = host.split(':')
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-                if sock.connect_ex((ipAddress, int(port))) == 0:
-                    connected += 1
-                else:
-                    logger.info(f'failed to connect to {ipAddress} on port {port}')
-
-        self.message = f'connected {connected}/{len(self.hosts)}'
-        if connected == len(self.hosts):
+        semaphore = asyncio.Semaphore(self.maxConcurrency)
+        pending = [split_host(host) for host in self.hosts]
+        deadline = time.monotonic() + self.deadline
+
+        async def probe(ipAddress, port):
+            async with semaphore:
+                if await probe_port(ipAddress, int(port), self.timeout):
+                    return True
+                logger.info(f'failed to connect to {ipAddress} on port {port}', extra={'task': self})
+                return False
+
+        while True:
+            results = await asyncio.gather(*[probe(ipAddress, port) for ipAddress, port in pending])
+            pending = [host for host, connected in zip(pending, results) if not connected]
+            self.message = f'connected {len(self.hosts) - len(pending)}/{len(self.hosts)}'
+
+            if self.status == TaskStatus.CANCELLED:
+                return
+            if not pending or not self.waitUntilUp or time.monotonic() + self.retryInterval > deadline:
+                break
+            await asyncio.sleep(self.retryInterval)
+
+        if not pending:
             await super().complete()
         else:
             await super().complete(TaskStatus.ERROR)
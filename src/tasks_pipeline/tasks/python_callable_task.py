@@ -0,0 +1,69 @@
+import asyncio
+import importlib
+import logging
+from functools import reduce
+
+from .base_task import BaseTask
+from .task_status import TaskStatus
+from ..process_pool import get_process_pool
+
+
+logger = logging.getLogger('tasks_pipeline.python_callable_task')
+
+
+def call_function(function, args, kwargs):
+    mod, attr = function.split(':')
+    f = reduce(getattr, attr.split('.'), importlib.import_module(mod))
+    return f(*args, **kwargs)
+
+
+class PythonCallableTask(BaseTask):
+    __slots__ = ('function', 'args', 'kwargs', 'future', 'result')
+
+    def __init__(self, name, function=None, args=[], kwargs={}):
+        super().__init__(name)
+        if not function or ':' not in function:
+            raise TypeError(f"function expected 'module:function', got {function!r}")
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.future = None
+        self.result = None
+
+    @staticmethod
+    def check_params(params):
+        function = params.get('function')
+        if not isinstance(function, str) or ':' not in function:
+            return [f"function expected 'module:function', got {function!r}"]
+        return []
+
+    async def run(self):
+        await super().run()
+
+        self.message = ''
+        self.result = None
+        loop = asyncio.get_running_loop()
+        self.future = loop.run_in_executor(get_process_pool(), call_function, self.function, self.args, self.kwargs)
+
+        try:
+            self.result = await self.future
+        except asyncio.CancelledError:
+            if self.status == TaskStatus.CANCELLED:
+                return
+            raise
+        except Exception as e:
+            logger.exception(f'{self.function} failed', extra={'task': self})
+            self.message = f'{type(e).__name__}: {e}'
+            await super().complete(TaskStatus.ERROR)
+            return
+        finally:
+            self.future = None
+
+        if self.result is not None:
+            self.message = str(self.result).split('\n')[0][:200]
+        await super().complete()
+
+    async def cancel(self):
+        await super().cancel()
+        if self.future:
+            self.future.cancel()
@@ -5,6 +5,8 @@ from .task_status import TaskStatus
 
 
 class RetryTask(BaseTask):
+    __slots__ = ('maxRetries', 'delayBetweenRetries')
+
     def __init__(self, name, maxRetries=1, delayBetweenRetries=0):
         super().__init__(name)
         self.maxRetries = maxRetries
@@ -15,7 +17,7 @@ class RetryTask(BaseTask):
         await super().run()
 
         task = self.tasks[0]
-        if task.status == TaskStatus.DISABLED:
+        if task.status == TaskStatus.DISABLED or task.restored:
             await super().complete()
             return
 
@@ -23,7 +25,9 @@ class RetryTask(BaseTask):
             if self.status == TaskStatus.CANCELLED:
                 return
             self.message = f'attempt {i + 1} out of {self.maxRetries}'
-            await task.run()
+            await task.execute()
+            if self.status == TaskStatus.CANCELLED:
+                return
             if task.status in (TaskStatus.COMPLETED, TaskStatus.DISABLED):
                 await super().complete()
                 return
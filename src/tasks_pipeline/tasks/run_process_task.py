@@ -1,52 +1,250 @@
 import logging
 import asyncio
+import os
 import re
+import signal
+import subprocess
+from collections import deque
+from contextlib import suppress
 
 from .base_task import BaseTask
 from .task_status import TaskStatus
+from ..result_cache import get_result_cache
+from ..output_spool import get_output_spool
 
 
 logger = logging.getLogger('tasks_pipeline.run_process_task')
 
 
+if os.name == 'posix':
+    NEW_PROCESS_GROUP = {'start_new_session': True}
+else:
+    NEW_PROCESS_GROUP = {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+
+
+def terminate_process_group(proc):
+    with suppress(ProcessLookupError):
+        if os.name == 'posix':
+            os.killpg(proc.pid, signal.SIGTERM)
+        else:
+            proc.send_signal(signal.CTRL_BREAK_EVENT)
+
+
+def kill_process_group(proc):
+    with suppress(ProcessLookupError):
+        if os.name == 'posix':
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+
+
+async def read_lines(stream, chunkSize=65536, maxLineLen=65536, spool=None):
+    # the raw lines are also written to the spool file, which buffers them
+    pending = b''
+    while chunk := await stream.read(chunkSize):
+        pending += chunk
+        *lines, pending = pending.split(b'\n')
+        if spool and lines:
+            spool.write(b'\n'.join(lines) + b'\n')
+        for line in lines:
+            yield line.decode(errors='replace').replace('\r', '')
+        if len(pending) > maxLineLen:
+            if spool:
+                spool.write(pending + b'\n')
+            yield pending.decode(errors='replace').replace('\r', '')
+            pending = b''
+    if pending:
+        if spool:
+            spool.write(pending + b'\n')
+        yield pending.decode(errors='replace').replace('\r', '')
+
+
 class RunProcessTask(BaseTask):
-    def __init__(self, name, cmd=None, expectedOutput=None):
+    __slots__ = (
+        'cmd',
+        'expectedOutput',
+        'expectedOutputPattern',
+        'outputLines',
+        'stopOnMatch',
+        'timeout',
+        'killGracePeriod',
+        'cache',
+        'inputs',
+        'envVars',
+        'stdout',
+        'stderr',
+        'proc',
+        'spoolFile',
+        'hasOutput',
+        'matched',
+    )
+
+    def __init__(
+        self,
+        name,
+        cmd=None,
+        expectedOutput=None,
+        outputLines=100,
+        stopOnMatch=False,
+        timeout=None,
+        killGracePeriod=5.0,
+        cache=False,
+        inputs=[],
+        envVars=[],
+    ):
         super().__init__(name)
         if not cmd:
             raise TypeError('cmd expected 1 argument, got 0')
         self.cmd = cmd
         self.expectedOutput = expectedOutput
+        self.expectedOutputPattern = re.compile(expectedOutput) if expectedOutput else None
+        self.stopOnMatch = stopOnMatch
+        self.timeout = float(timeout) if timeout else None
+        self.killGracePeriod = float(killGracePeriod)
+        self.cache = cache
+        self.inputs = inputs
+        self.envVars = envVars
+        self.outputLines = outputLines
+        # the output buffers are only allocated when the task runs
+        self.stdout = ()
+        self.stderr = ()
+        self.proc = None
+        self.spoolFile = None
+        self.hasOutput = False
+        self.matched = False
         logger.debug(self.expectedOutput)
 
+    @staticmethod
+    def check_params(params):
+        errors = []
+        if not params.get('cmd'):
+            errors.append('cmd expected 1 argument, got 0')
+        if isinstance(expectedOutput := params.get('expectedOutput'), str):
+            try:
+                re.compile(expectedOutput)
+            except re.error as e:
+                errors.append(f"parameter 'expectedOutput' is not a valid pattern: {e}")
+        return errors
+
     async def run(self):
         await super().run()
 
-        proc = await asyncio.create_subprocess_shell(
-            self.cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
-        )
+        self.message = ''
+        self.stdout = deque(maxlen=self.outputLines)
+        self.stderr = deque(maxlen=self.outputLines)
+        self.hasOutput = False
+        self.matched = False
 
-        stdout, stderr = await proc.communicate()
+        cache = get_result_cache() if self.cache else None
+        if cache:
+            cacheKey = await asyncio.to_thread(cache.key, self.cmd, self.inputs, self.envVars, [self.expectedOutput])
+            if entry := await asyncio.to_thread(cache.get, cacheKey):
+                self.stdout.extend(entry.get('stdout', []))
+                if spoolFile := self.open_spool():
+                    with spoolFile:
+                        spoolFile.write(''.join(f'{line}\n' for line in self.stdout).encode())
+                self.message = 'cached'
+                await super().complete()
+                return
 
-        if stdout:
-            logger.debug(stdout.decode())
+        self.proc = await asyncio.create_subprocess_shell(
+            self.cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, **NEW_PROCESS_GROUP
+        )
+        self.spoolFile = self.open_spool()
 
-        if stderr:
-            logger.error(stderr.decode())
+        try:
+            await asyncio.wait_for(self.read_output(), self.timeout)
+        except asyncio.TimeoutError:
+            await self.terminate_process()
+            self.message = f'timed out after {self.timeout:g}s'
+            await super().complete(TaskStatus.ERROR)
+            return
+        finally:
+            self.proc = None
+            if self.spoolFile:
+                self.spoolFile.close()
+                self.spoolFile = None
+
+        if self.status == TaskStatus.CANCELLED:
+            return
 
-        if stderr:
-            self.message = stderr.decode().replace('\r', '').replace('\n', ' ')
+        if self.stderr:
+            self.message = ' '.join(self.stderr)
             await super().complete(TaskStatus.ERROR)
             return
 
-        if self.expectedOutput and not stdout:
+        if self.expectedOutput and not self.hasOutput:
             self.message = 'no output'
             await super().complete(TaskStatus.ERROR)
             return
 
-        if self.expectedOutput and not re.search(self.expectedOutput, stdout.decode().strip()):
+        if self.expectedOutput and not self.matched:
             self.message = 'unexpected output'
-            logger.error(stdout.decode())
+            logger.error('\n'.join(self.stdout), extra={'task': self})
             await super().complete(TaskStatus.ERROR)
             return
 
+        if cache:
+            await asyncio.to_thread(cache.put, cacheKey, {'cmd': self.cmd, 'stdout': list(self.stdout)})
+
         await super().complete()
+
+    def open_spool(self):
+        spool = get_output_spool()
+        if not spool:
+            return None
+        try:
+            return spool.open(self)
+        except OSError as e:
+            logger.warning(f'cannot spool the output to {spool.path(self)}: {e}', extra={'task': self})
+            return None
+
+    async def read_output(self):
+        stderrReader = asyncio.create_task(self.read_stderr())
+        try:
+            await self.read_stdout()
+            if self.matched and self.stopOnMatch:
+                stderrReader.cancel()
+                await self.terminate_process()
+            else:
+                await stderrReader
+            await self.proc.wait()
+        finally:
+            stderrReader.cancel()
+
+    async def read_stdout(self):
+        async for line in read_lines(self.proc.stdout, spool=self.spoolFile):
+            self.hasOutput = True
+            logger.debug(line, extra={'task': self})
+            self.stdout.append(line)
+            self.message = line
+            if self.expectedOutputPattern and not self.matched and self.expectedOutputPattern.search(line.strip()):
+                self.matched = True
+                if self.stopOnMatch:
+                    return
+
+    async def read_stderr(self):
+        async for line in read_lines(self.proc.stderr, spool=self.spoolFile):
+            logger.error(line, extra={'task': self})
+            self.stderr.append(line)
+            self.message = line
+
+    async def terminate_process(self):
+        proc = self.proc
+        if not proc:
+            return
+
+        terminate_process_group(proc)
+        try:
+            await asyncio.wait_for(proc.wait(), self.killGracePeriod)
+        except asyncio.TimeoutError:
+            logger.info(
+                f'process did not terminate after {self.killGracePeriod:g}s, killing it: {self.cmd}',
+                extra={'task': self},
+            )
+            kill_process_group(proc)
+            await proc.wait()
+
+    async def cancel(self):
+        await super().cancel()
+        await self.terminate_process()
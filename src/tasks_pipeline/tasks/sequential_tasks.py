@@ -3,6 +3,8 @@ from .task_status import TaskStatus
 
 
 class SequentialTask(BaseTask):
+    __slots__ = ()
+
     def __init__(self, name):
         super().__init__(name)
 
@@ -10,11 +12,13 @@ class SequentialTask(BaseTask):
         await super().run()
 
         for task in self.tasks:
-            if task.status == TaskStatus.DISABLED:
+            if task.status == TaskStatus.DISABLED or task.restored:
                 continue
             if task.status == TaskStatus.CANCELLED:
                 return
-            await task.run()
+            await task.execute()
+            if self.status == TaskStatus.CANCELLED:
+                return
             if task.status not in (TaskStatus.COMPLETED, TaskStatus.DISABLED):
                 await super().complete(TaskStatus.ERROR)
                 break
@@ -0,0 +1,120 @@
+import array
+import datetime
+import math
+
+from .task_status import TaskStatus
+
+
+STATUSES = [None] + list(TaskStatus)
+# set on the status code of tasks that have children, so counting leaves is a plain scan of the codes
+CONTAINER = 0x80
+NO_TIME = math.nan
+
+
+def to_timestamp(value: datetime.datetime | None):
+    return NO_TIME if value is None else value.timestamp()
+
+
+def to_datetime(value: float):
+    return None if math.isnan(value) else datetime.datetime.fromtimestamp(value)
+
+
+class TaskStateStore:
+    __slots__ = ('status', 'startTime', 'stopTime', 'readyTime', 'parents', 'leafCounts', 'free')
+
+    def __init__(self, size=0):
+        self.status = bytearray([TaskStatus.NOT_STARTED.value]) * size
+        self.startTime = array.array('d', [NO_TIME]) * size
+        self.stopTime = array.array('d', [NO_TIME]) * size
+        self.readyTime = array.array('d', [NO_TIME]) * size
+        # the index of the parent of each task, -1 for the root and for tasks outside a model
+        self.parents = array.array('q', [-1]) * size
+        # the leaves of each container by status value, updated when a leaf changes its status
+        self.leafCounts = {}
+        self.free = []
+
+    def __len__(self):
+        return len(self.status)
+
+    def allocate(self):
+        if self.free:
+            return self.free.pop()
+        self.status.append(TaskStatus.NOT_STARTED.value)
+        self.startTime.append(NO_TIME)
+        self.stopTime.append(NO_TIME)
+        self.readyTime.append(NO_TIME)
+        self.parents.append(-1)
+        return len(self.status) - 1
+
+    def release(self, index):
+        if len(self.free) + 1 == len(self.status):
+            # the last task left, a model took them all, so the store shrinks instead of keeping a slot per task
+            for values in (self.status, self.startTime, self.stopTime, self.readyTime, self.parents):
+                del values[:]
+            self.free.clear()
+            return
+        self.status[index] = TaskStatus.NOT_STARTED.value
+        self.startTime[index] = self.stopTime[index] = self.readyTime[index] = NO_TIME
+        self.free.append(index)
+
+    def copy(self, index, other, otherIndex):
+        self.status[index] = other.status[otherIndex] | (self.status[index] & CONTAINER)
+        self.startTime[index] = other.startTime[otherIndex]
+        self.stopTime[index] = other.stopTime[otherIndex]
+        self.readyTime[index] = other.readyTime[otherIndex]
+
+    def get_status(self, index):
+        return STATUSES[self.status[index] & ~CONTAINER]
+
+    def set_status(self, index, status: TaskStatus):
+        code = self.status[index]
+        self.status[index] = status.value | (code & CONTAINER)
+        if code != status.value and not code & CONTAINER:
+            parent = self.parents[index]
+            while parent != -1:
+                counts = self.leafCounts[parent]
+                counts[code] -= 1
+                counts[status.value] += 1
+                parent = self.parents[parent]
+
+    def mark_container(self, index):
+        self.status[index] |= CONTAINER
+
+    def set_parent(self, index, parent):
+        self.parents[index] = parent
+
+    def count_leaves(self):
+        # children are stored after their parents, so walking backwards adds every subtree before its parent's
+        self.leafCounts = {i: [0] * len(STATUSES) for i, code in enumerate(self.status) if code & CONTAINER}
+        for i in range(len(self.status) - 1, -1, -1):
+            parent = self.parents[i]
+            if parent == -1:
+                continue
+            parentCounts = self.leafCounts[parent]
+            if self.status[i] & CONTAINER:
+                for code, n in enumerate(self.leafCounts[i]):
+                    parentCounts[code] += n
+            else:
+                parentCounts[self.status[i]] += 1
+
+    def leaf_counts(self, index):
+        if counts := self.leafCounts.get(index):
+            return counts
+        counts = [0] * len(STATUSES)
+        counts[self.status[index] & ~CONTAINER] = 1
+        return counts
+
+    def count_by_status(self, start=0, end=None, leavesOnly=True):
+        codes = self.status[start:end]
+        counts = {}
+        for status in TaskStatus:
+            n = codes.count(status.value)
+            if not leavesOnly:
+                n += codes.count(status.value | CONTAINER)
+            if n:
+                counts[status] = n
+        return counts
+
+
+# tasks that are not part of a pipeline model, like matrix rows while they run and the tasks created by workers
+defaultStore = TaskStateStore()
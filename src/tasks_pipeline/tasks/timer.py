@@ -0,0 +1,56 @@
+import asyncio
+import heapq
+import itertools
+import weakref
+
+
+class Timer:
+    def __init__(self, loop):
+        self.loop = loop
+        self.deadlines = []
+        self.counter = itertools.count()
+        self.handle = None
+
+    def time(self):
+        return self.loop.time()
+
+    def sleep_until(self, when):
+        future = self.loop.create_future()
+        heapq.heappush(self.deadlines, (when, next(self.counter), future))
+        if self.deadlines[0][2] is future:
+            self._schedule()
+        return future
+
+    def wake(self, future):
+        if not future.done():
+            future.set_result(False)
+
+    def _schedule(self):
+        while self.deadlines and self.deadlines[0][2].done():
+            heapq.heappop(self.deadlines)
+
+        if self.handle:
+            self.handle.cancel()
+            self.handle = None
+
+        if self.deadlines:
+            self.handle = self.loop.call_at(self.deadlines[0][0], self._fire)
+
+    def _fire(self):
+        self.handle = None
+        now = self.loop.time()
+        while self.deadlines and self.deadlines[0][0] <= now:
+            _, _, future = heapq.heappop(self.deadlines)
+            if not future.done():
+                future.set_result(True)
+        self._schedule()
+
+
+timers = weakref.WeakKeyDictionary()
+
+
+def get_timer():
+    loop = asyncio.get_running_loop()
+    if (timer := timers.get(loop)) is None:
+        timer = timers[loop] = Timer(loop)
+    return timer
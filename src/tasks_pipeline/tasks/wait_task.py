@@ -1,37 +1,75 @@
-import asyncio
 import datetime
 from itertools import zip_longest
 
 from .base_task import BaseTask
 from .task_status import TaskStatus
+from .timer import get_timer
 
 
-class WaitForTask(BaseTask):
+class BaseWaitTask(BaseTask):
+    __slots__ = ('timer', 'deadline', 'wakeup', '_message')
+
+    def __init__(self, name):
+        self.timer = None
+        self.deadline = None
+        self.wakeup = None
+        super().__init__(name)
+
+    @property
+    def message(self):
+        if self.status == TaskStatus.RUNNING and self.deadline is not None:
+            remaining = max(self.deadline - self.timer.time(), 0)
+            return 'remaining: ' + str(datetime.timedelta(seconds=int(remaining)))
+        return self._message
+
+    @message.setter
+    def message(self, message):
+        self._message = message
+
+    async def wait(self, seconds):
+        self.timer = get_timer()
+        self.deadline = self.timer.time() + seconds
+        self.wakeup = self.timer.sleep_until(self.deadline)
+        try:
+            await self.wakeup
+        finally:
+            self.deadline = None
+            self.wakeup = None
+
+        if self.status != TaskStatus.CANCELLED:
+            await super().complete()
+
+    async def cancel(self):
+        await super().cancel()
+        if self.wakeup:
+            self.timer.wake(self.wakeup)
+
+
+class WaitForTask(BaseWaitTask):
+    __slots__ = ('waitFor',)
+
     def __init__(self, name, waitFor: datetime.timedelta | str | int):
         super().__init__(name)
         self.waitFor = waitFor
         if isinstance(waitFor, str | int):
             self.waitFor = datetime.timedelta(seconds=int(waitFor))
 
+    @staticmethod
+    def check_params(params):
+        waitFor = params.get('waitFor')
+        if isinstance(waitFor, str) and not waitFor.strip().lstrip('+-').isdigit():
+            return [f"parameter 'waitFor' expected a number of seconds, got {waitFor!r}"]
+        return []
+
     async def run(self):
         await super().run()
 
-        waitUntil = datetime.datetime.now() + self.waitFor
+        await self.wait(self.waitFor.total_seconds())
 
-        while waitUntil > datetime.datetime.now():
-            if self.status == TaskStatus.CANCELLED:
-                break
-            elapsed = waitUntil - datetime.datetime.now()
-            self.message = 'remaining: ' + str(elapsed).split('.')[0]
-            await asyncio.sleep(0.1)
-        else:
-            await super().complete()
 
-    async def cancel(self):
-        await super().cancel()
+class WaitUntilTask(BaseWaitTask):
+    __slots__ = ('waitUntil',)
 
-
-class WaitUntilTask(BaseTask):
     def __init__(self, name, waitUntil: datetime.datetime | str = None):
         super().__init__(name)
         self.waitUntil = waitUntil
@@ -62,14 +100,4 @@ class WaitUntilTask(BaseTask):
                         break
             self.waitUntil = d1
 
-        while self.waitUntil > datetime.datetime.now():
-            if self.status == TaskStatus.CANCELLED:
-                break
-            elapsed = self.waitUntil - datetime.datetime.now()
-            self.message = 'remaining: ' + str(elapsed).split('.')[0]
-            await asyncio.sleep(0.1)
-        else:
-            await super().complete()
-
-    async def cancel(self):
-        await super().cancel()
+        await self.wait((self.waitUntil - datetime.datetime.now()).total_seconds())
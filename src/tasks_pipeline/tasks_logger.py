@@ -1,5 +1,164 @@
+import atexit
 import logging
+import logging.handlers
 import datetime
+import os
+import queue
+import re
+from collections import OrderedDict
+
+
+FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+logWriter = None
+queueHandlers = {}
+
+
+class LoggerQueueHandler(logging.handlers.QueueHandler):
+    # sends the records of one logger to the writer thread together with the handlers they are for
+    def __init__(self, queue):
+        super().__init__(queue)
+        self.handlers = []
+
+    def emit(self, record):
+        if any(record.levelno >= handler.level for handler in self.handlers):
+            super().emit(record)
+
+    def prepare(self, record):
+        # the record stays in this process, so it is not copied, only its arguments are merged before they change
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record):
+        self.queue.put_nowait((self.handlers, record))
+
+
+class LogWriter(logging.handlers.QueueListener):
+    def __init__(self, queue):
+        super().__init__(queue)
+        self.unflushed = set()
+
+    def handle(self, item):
+        handlers, record = item
+        for handler in handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+                self.unflushed.add(handler)
+
+        # handlers that buffer their writes are flushed once the writer caught up
+        if self.queue.empty():
+            for handler in self.unflushed:
+                handler.flush()
+            self.unflushed.clear()
+
+    def stop(self):
+        super().stop()
+        for queueHandler in queueHandlers.values():
+            for handler in queueHandler.handlers:
+                handler.close()
+
+
+def get_log_writer():
+    global logWriter
+    if not logWriter:
+        logWriter = LogWriter(queue.SimpleQueue())
+        logWriter.start()
+        atexit.register(logWriter.stop)
+    return logWriter
+
+
+def add_handler(loggerName, handler):
+    # the handler runs on the writer thread, so slow files or consoles never block the event loop
+    queueHandler = queueHandlers.get(loggerName)
+    if not queueHandler:
+        queueHandler = queueHandlers[loggerName] = LoggerQueueHandler(get_log_writer().queue)
+        logging.getLogger(loggerName).addHandler(queueHandler)
+    queueHandler.handlers.append(handler)
+
+
+def slugify(name):
+    return re.sub(r'[^\w.-]+', '_', name).strip('_.') or 'task'
+
+
+def task_file_name(model, task, extension):
+    if taskModel := model.get_task_model(task):
+        return f'{taskModel.taskIndex}-{slugify(taskModel.name)}{extension}'
+    return f'{slugify(task.name)}{extension}'
+
+
+class TaskLogFile:
+    # rotates on the bytes it wrote itself, RotatingFileHandler formats every record twice and seeks to check the size,
+    # like RotatingFileHandler it never rotates when maxBytes or backupCount is 0
+    def __init__(self, path, maxBytes=0, backupCount=0):
+        self.path = path
+        self.maxBytes = maxBytes
+        self.backupCount = backupCount
+        self.stream = open(path, 'ab')
+        self.size = self.stream.tell()
+
+    def write(self, text):
+        data = text.encode('utf-8', errors='replace')
+        if self.maxBytes and self.backupCount and self.size and self.size + len(data) > self.maxBytes:
+            self.rotate()
+        self.stream.write(data)
+        self.size += len(data)
+
+    def rotate(self):
+        self.stream.close()
+        for i in range(self.backupCount - 1, 0, -1):
+            if os.path.exists(f'{self.path}.{i}'):
+                os.replace(f'{self.path}.{i}', f'{self.path}.{i + 1}')
+        os.replace(self.path, f'{self.path}.1')
+        self.stream = open(self.path, 'wb')
+        self.size = 0
+
+    def flush(self):
+        self.stream.flush()
+
+    def close(self):
+        self.stream.close()
+
+
+class TaskLogFiles(logging.Handler):
+    # writes the records logged with extra={'task': task} to one rotating file per task
+    def __init__(self, model, directory, maxBytes=0, backupCount=0, maxOpenFiles=32):
+        super().__init__()
+        self.model = model
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.backupCount = backupCount
+        self.maxOpenFiles = maxOpenFiles
+        self.files = OrderedDict()
+        os.makedirs(directory, exist_ok=True)
+
+    def emit(self, record):
+        task = getattr(record, 'task', None)
+        if task is None:
+            return
+
+        try:
+            fileName = task_file_name(self.model, task, '.log')
+            logFile = self.files.pop(fileName, None)
+            if not logFile:
+                if len(self.files) >= self.maxOpenFiles:
+                    self.files.popitem(last=False)[1].close()
+                logFile = TaskLogFile(os.path.join(self.directory, fileName), self.maxBytes, self.backupCount)
+            self.files[fileName] = logFile
+            logFile.write(self.format(record) + '\n')
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        for logFile in self.files.values():
+            logFile.flush()
+
+    def close(self):
+        for logFile in self.files.values():
+            logFile.close()
+        self.files.clear()
+        super().close()
 
 
 def setup_loggers(loggersConfig):
@@ -8,27 +167,48 @@ def setup_loggers(loggersConfig):
 
     defaultUseConsole = loggersConfig.get('console', False)
     defaultFile = loggersConfig.get('file')
-    defaultFile = datetime.datetime.now().strftime(defaultFile)
+    defaultFile = datetime.datetime.now().strftime(defaultFile) if defaultFile else None
+    formatter = logging.Formatter(FORMAT)
+    # loggers writing to the same file share one handler
+    fileHandlers = {}
 
     for loggerName, loggerConfig in loggersConfig.get('loggers', {}).items():
         level = loggerConfig.get('level', 'INFO')
         level = logging.getLevelName(level)
         useConsole = loggerConfig.get('console', defaultUseConsole)
         file = loggerConfig.get('file', defaultFile)
-        file = datetime.datetime.now().strftime(file)
-
-        logger = logging.getLogger(loggerName)
-        logger.setLevel(level)
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+        file = datetime.datetime.now().strftime(file) if file else None
+        logging.getLogger(loggerName).setLevel(level)
 
         if file:
-            fh = logging.FileHandler(file, encoding='utf-8')
-            fh.setLevel(level)
-            fh.setFormatter(formatter)
-            logger.addHandler(fh)
+            fh = fileHandlers.get((file, level))
+            if not fh:
+                fh = fileHandlers[file, level] = logging.FileHandler(file, encoding='utf-8', delay=True)
+                fh.setLevel(level)
+                fh.setFormatter(formatter)
+            add_handler(loggerName, fh)
 
         if useConsole:
             ch = logging.StreamHandler()
             ch.setLevel(level)
             ch.setFormatter(formatter)
-            logger.addHandler(ch)
+            add_handler(loggerName, ch)
+
+
+def setup_task_logs(pipelineModel):
+    loggersConfig = pipelineModel.config.get('logging') or {}
+    taskFilesConfig = loggersConfig.get('taskFiles')
+    if not loggersConfig.get('enabled', True) or not taskFilesConfig or not taskFilesConfig.get('enabled', True):
+        return None
+
+    handler = TaskLogFiles(
+        pipelineModel,
+        datetime.datetime.now().strftime(taskFilesConfig.get('directory', 'logs')),
+        maxBytes=taskFilesConfig.get('maxBytes', 0),
+        backupCount=taskFilesConfig.get('backupCount', 0),
+        maxOpenFiles=taskFilesConfig.get('maxOpenFiles', 32),
+    )
+    handler.setLevel(logging.getLevelName(taskFilesConfig.get('level', 'DEBUG')))
+    handler.setFormatter(logging.Formatter(FORMAT))
+    add_handler('tasks_pipeline', handler)
+    return handler
@@ -0,0 +1,262 @@
+import json
+import logging
+import os
+
+from .tasks import TaskStatus
+from .pipeline_model import PipelineModel
+
+
+logger = logging.getLogger('tasks_pipeline.trace')
+
+
+FINAL_STATUSES = (TaskStatus.COMPLETED, TaskStatus.ERROR, TaskStatus.CANCELLED)
+GROUP_TYPES = ('ParallelTask', 'DagTask')
+
+
+class Trace:
+    def __init__(self, model: PipelineModel, file, format='chrome'):
+        if format not in ('chrome', 'otlp'):
+            raise ValueError(f'trace format must be "chrome" or "otlp", got {format!r}')
+        self.model = model
+        self.file = file
+        self.format = format
+        self.summary = None
+        self.readyTimes = {}
+        # matrix rows are dropped once they ran, their spans are taken when they finish
+        self.rowSpans = []
+
+        model.watch_tasks(
+            lambda taskModel: taskModel.task.add_status_listener(
+                lambda task, oldStatus, newStatus, t=taskModel: self.on_status_change(t, newStatus)
+            )
+        )
+
+    def on_status_change(self, taskModel, newStatus):
+        if newStatus == TaskStatus.RUNNING:
+            self.readyTimes[taskModel] = taskModel.task.readyTime or taskModel.task.startTime
+        elif newStatus in FINAL_STATUSES and taskModel.task in self.model.rows:
+            if span := self.span(taskModel):
+                self.rowSpans.append(span)
+            self.readyTimes.pop(taskModel, None)
+        elif newStatus in FINAL_STATUSES and taskModel is self.model.rootTask:
+            self.write()
+
+    def span(self, taskModel):
+        task = taskModel.task
+        if not task.startTime or not task.stopTime or task.restored:
+            return None
+        readyTime = self.readyTimes.get(taskModel) or task.startTime
+        return {
+            'index': taskModel.taskIndex,
+            'parent': taskModel.parentTask.taskIndex if taskModel.parentTask else None,
+            'name': taskModel.name,
+            'type': type(task).__name__,
+            'status': task.status.name,
+            'start': task.startTime.timestamp(),
+            'end': task.stopTime.timestamp(),
+            'wait': max((task.startTime - readyTime).total_seconds(), 0),
+        }
+
+    def spans(self):
+        return [span for span in map(self.span, self.model.tasks) if span] + self.rowSpans
+
+    def write(self):
+        spans = self.spans()
+        trace = chrome_trace(spans) if self.format == 'chrome' else otlp_trace(spans, self.model.title)
+        tmpFile = f'{self.file}.{os.getpid()}.tmp'
+        with open(tmpFile, 'w', encoding='utf-8') as f:
+            json.dump(trace, f)
+        os.replace(tmpFile, self.file)
+        logger.info(f'trace written to {self.file}')
+
+        self.summary = format_summary(spans)
+        logger.info(self.summary)
+
+
+def assign_lanes(spans):
+    # spans on the same lane must nest or not overlap at all for trace viewers to draw them
+    lanes = []
+    laneOf = {}
+    for span in sorted(spans, key=lambda s: (s['start'], -s['end'])):
+        for lane, stack in enumerate(lanes):
+            while stack and stack[-1] <= span['start']:
+                stack.pop()
+            if not stack or span['end'] <= stack[-1]:
+                break
+        else:
+            lane = len(lanes)
+            lanes.append([])
+        lanes[lane].append(span['end'])
+        laneOf[span['index']] = lane
+    return laneOf
+
+
+def chrome_trace(spans):
+    laneOf = assign_lanes(spans)
+    events = []
+    for span in spans:
+        events.append(
+            {
+                'name': span['name'].strip() or span['type'],
+                'cat': span['type'],
+                'ph': 'X',
+                'ts': span['start'] * 1e6,
+                'dur': (span['end'] - span['start']) * 1e6,
+                'pid': 1,
+                'tid': laneOf[span['index']],
+                'args': {k: span[k] for k in ('index', 'parent', 'type', 'status', 'wait')},
+            }
+        )
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def otlp_trace(spans, title):
+    traceId = os.urandom(16).hex()
+    spanIds = {span['index']: os.urandom(8).hex() for span in spans}
+
+    def attribute(key, value):
+        if isinstance(value, float):
+            return {'key': key, 'value': {'doubleValue': value}}
+        if isinstance(value, int):
+            return {'key': key, 'value': {'intValue': str(value)}}
+        return {'key': key, 'value': {'stringValue': str(value)}}
+
+    otlpSpans = []
+    for span in spans:
+        otlpSpan = {
+            'traceId': traceId,
+            'spanId': spanIds[span['index']],
+            'name': span['name'].strip() or span['type'],
+            'kind': 1,
+            'startTimeUnixNano': str(int(span['start'] * 1e9)),
+            'endTimeUnixNano': str(int(span['end'] * 1e9)),
+            'attributes': [
+                attribute('task.index', span['index']),
+                attribute('task.type', span['type']),
+                attribute('task.status', span['status']),
+                attribute('task.wait_seconds', float(span['wait'])),
+            ],
+            'status': {'code': 1 if span['status'] == TaskStatus.COMPLETED.name else 2},
+        }
+        if span['parent'] in spanIds:
+            otlpSpan['parentSpanId'] = spanIds[span['parent']]
+            otlpSpan['attributes'].append(attribute('task.parent', span['parent']))
+        otlpSpans.append(otlpSpan)
+
+    return {
+        'resourceSpans': [
+            {
+                'resource': {'attributes': [attribute('service.name', 'tasks_pipeline'), attribute('title', title)]},
+                'scopeSpans': [{'scope': {'name': 'tasks_pipeline'}, 'spans': otlpSpans}],
+            }
+        ]
+    }
+
+
+def load_spans(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        trace = json.load(f)
+
+    if 'traceEvents' in trace:
+        return [
+            {**e['args'], 'name': e['name'], 'start': e['ts'] / 1e6, 'end': (e['ts'] + e['dur']) / 1e6}
+            for e in trace['traceEvents']
+            if e.get('ph') == 'X'
+        ]
+
+    spans = []
+    for resourceSpans in trace['resourceSpans']:
+        for scopeSpans in resourceSpans['scopeSpans']:
+            for s in scopeSpans['spans']:
+                attributes = {a['key']: next(iter(a['value'].values())) for a in s['attributes']}
+                spans.append(
+                    {
+                        'index': int(attributes['task.index']),
+                        'parent': int(attributes['task.parent']) if 'task.parent' in attributes else None,
+                        'name': s['name'],
+                        'type': attributes['task.type'],
+                        'status': attributes['task.status'],
+                        'start': int(s['startTimeUnixNano']) / 1e9,
+                        'end': int(s['endTimeUnixNano']) / 1e9,
+                        'wait': float(attributes['task.wait_seconds']),
+                    }
+                )
+    return spans
+
+
+def critical_path(spans):
+    children = {}
+    for span in spans:
+        children.setdefault(span['parent'], []).append(span)
+    indexes = {span['index'] for span in spans}
+    roots = [span for span in spans if span['parent'] not in indexes]
+    if not roots:
+        return []
+
+    path = []
+    # walk back from the span that finished last: at each level take the child that finished last, then the
+    # sibling that finished last before it started, and so on, expanding every child on the way down
+    stack = [max(roots, key=lambda s: s['end'])]
+    while stack:
+        span = stack.pop()
+        siblings = children.get(span['index'])
+        if not siblings:
+            path.append(span)
+            continue
+
+        end = span['end']
+        for child in sorted(siblings, key=lambda s: s['end'], reverse=True):
+            if child['end'] <= end:
+                stack.append(child)
+                end = child['start']
+
+    path.sort(key=lambda s: s['start'])
+    return path
+
+
+def group_slack(spans):
+    children = {}
+    for span in spans:
+        children.setdefault(span['parent'], []).append(span)
+
+    groups = []
+    for span in spans:
+        if span['type'] not in GROUP_TYPES or not children.get(span['index']):
+            continue
+        members = children[span['index']]
+        slowest = max(members, key=lambda s: s['end'])
+        slack = sum(slowest['end'] - s['end'] for s in members)
+        groups.append((slack, span, slowest))
+    groups.sort(key=lambda g: -g[0])
+    return groups
+
+
+def format_summary(spans, maxGroups=10):
+    lines = []
+    path = critical_path(spans)
+    if path:
+        lines.append(f'critical path ({path[-1]["end"] - path[0]["start"]:.1f}s):')
+        for span in path:
+            lines.append(
+                f'  {span["end"] - span["start"]:8.1f}s  #{span["index"]} {span["name"].strip()}'
+                f'  (waited {span["wait"]:.1f}s, {span["status"]})'
+            )
+
+    if groups := group_slack(spans):
+        lines.append('idle slack per parallel group:')
+        for slack, span, slowest in groups[:maxGroups]:
+            lines.append(
+                f'  {slack:8.1f}s  #{span["index"]} {span["name"].strip()}'
+                f'  (slowest child #{slowest["index"]} {slowest["name"].strip()},'
+                f' {slowest["end"] - slowest["start"]:.1f}s)'
+            )
+
+    return '\n'.join(lines)
+
+
+def setup_trace(pipelineModel: PipelineModel, file=None, format=None):
+    traceConfig = pipelineModel.config.get('trace') or {}
+    file = file or traceConfig.get('file')
+    if not file:
+        return None
+    return Trace(pipelineModel, file, format or traceConfig.get('format', 'chrome'))
@@ -1,12 +1,17 @@
-def flatten_tasks(task):
-    tasks = []
-    tasks.append(task)
-    for child in task.subtasks:
-        tasks.extend(flatten_tasks(child))
-    return tasks
+def iter_tasks(task, skipCollapsed=False):
+    # iterative pre-order walk, generated trees can be deeper than the recursion limit
+    stack = [task]
+    while stack:
+        task = stack.pop()
+        yield task
+        if not (skipCollapsed and task.collapsed):
+            stack.extend(reversed(task.subtasks))
+
+
+def flatten_tasks(task, skipCollapsed=False):
+    return list(iter_tasks(task, skipCollapsed))
 
 
 def tasks_apply(task, f):
-    f(task)
-    for child in task.subtasks:
-        tasks_apply(child, f)
+    for t in iter_tasks(task):
+        f(t)
@@ -1,7 +1,8 @@
 import asyncio
 import curses
 import datetime
-import math
+import logging
+import time
 from statistics import median
 
 from .color_manager import ColorManager
@@ -17,6 +18,11 @@ except ModuleNotFoundError:
 from .tasks import TaskStatus
 from .pipeline_model import InputMode, PipelineModel
 from .config import get_config
+from .resources import is_waiting_for_resources
+from .output_spool import get_output_path
+
+
+logger = logging.getLogger('tasks_pipeline.view')
 
 
 class ScreenRenderer:
@@ -27,6 +33,12 @@ class ScreenRenderer:
         self.maxx = None
         self.taskStartIndex = 0
         self.hasHiddentTasks = False
+        self.lines = []
+        self.drawnLines = {}
+        self.frameCount = 0
+        self.frameTime = 0.0
+        self.lastFrameTime = 0.0
+        self.linesDrawn = 0
 
         self.update(model)
 
@@ -40,50 +52,85 @@ class ScreenRenderer:
         self.colors.get_color(255, 165, 0, 'orange')
         self.colors.get_color(240, 240, 240, 'light')
 
+        self.statusColors = {
+            TaskStatus.NOT_STARTED: self.colors.get('grey'),
+            TaskStatus.DISABLED: self.colors.get('dark grey'),
+            TaskStatus.RUNNING: self.colors.get('light grey'),
+            TaskStatus.COMPLETED: self.colors.get('green'),
+            TaskStatus.CANCELLED: self.colors.get('red'),
+            TaskStatus.ERROR: self.colors.get('red'),
+        }
+
     def update(self, model: PipelineModel | None = None):
+        frameStart = time.perf_counter()
         if model:
             self.model = model
-        self.maxy, self.maxx = self.stdscr.getmaxyx()
+
+        maxy, maxx = self.stdscr.getmaxyx()
+        if (maxy, maxx) != (self.maxy, self.maxx):
+            self._resize(maxy, maxx)
+
         if self.maxy < 6:
-            win = self.lines[0]
-            win.clear()
-            win.addstr('The screen is too samll')
-            win.refresh()
-            return
+            self._drawLine(0, [('The screen is too samll', 0)])
+        elif self.model.pager and self.model.inputMode in (InputMode.PAGER, InputMode.PAGER_SEARCH):
+            self._showPager()
+        else:
+            self._showTitle()
+            self._updateScroll()
+            self._showTasks()
+            self._showOptions()
+
+        curses.doupdate()
+
+        self.lastFrameTime = time.perf_counter() - frameStart
+        self.frameTime += self.lastFrameTime
+        self.frameCount += 1
+
+    def _resize(self, maxy, maxx):
+        self.maxy, self.maxx = maxy, maxx
+        self.stdscr.erase()
+        self.stdscr.noutrefresh()
         self.lines = [curses.newwin(1, self.maxx, i, 0) for i in range(self.maxy)]
-        self._showTitle()
-        self._updateScroll()
-        self._showTasks()
-        self._showOptions()
+        self.drawnLines = {}
 
-    def _showTitle(self):
-        color = self.colors.get('grey')
+    def _drawLine(self, lineIndex, columns):
+        if self.drawnLines.get(lineIndex) == columns:
+            return
+        win = self.lines[lineIndex]
+        win.erase()
+        for t, c in columns:
+            win.addstr(t, c)
+        win.noutrefresh()
+        self.drawnLines[lineIndex] = columns
+        self.linesDrawn += 1
 
-        win = self.lines[0]
-        win.clear()
-        win.addstr(self.model.title, color)
-        win.refresh()
+    def _clearLine(self, lineIndex):
+        self._drawLine(lineIndex, [])
+
+    def _showTitle(self):
+        self._drawLine(0, [(self.model.title, self.colors.get('grey'))])
+        # the line below the title stays empty, the pager draws its first line there
+        self._clearLine(1)
 
     def _numVisibleTasks(self):
         maxTasks = self.maxy - 6
-        return min(maxTasks, len(self.model.tasks))
+        return min(maxTasks, len(self.model.visibleTasks))
 
     def _showTasks(self):
         screenTaskStart = 3
 
         numVisibleTasks = self._numVisibleTasks()
-        visibleTasks = self.model.tasks[self.taskStartIndex : self.taskStartIndex + numVisibleTasks]
-        taskWin = self.lines[screenTaskStart : screenTaskStart + numVisibleTasks]
+        visibleTasks = self.model.visibleTasks[self.taskStartIndex : self.taskStartIndex + numVisibleTasks]
 
-        nameLen = min(max(len(t.displayPrefix + t.name) for t in self.model.tasks), 20)
+        nameLen = self.model.nameLen
         elapsedLen = 8
         statusLen = 12
         msgLen = self.maxx - nameLen - elapsedLen - statusLen - 9
 
         showNumbers = self.model.inputMode in (InputMode.GET_TASK, InputMode.GET_COMMAND)
-        numLinesWidth = (int(math.log10(visibleTasks[-1].taskIndex + 1)) + 1) if showNumbers else 0
+        numLinesWidth = self.model.indexLen if showNumbers else 0
 
-        self.lines[2].addstr(
+        header = (
             ' ' * (numLinesWidth + 1 if numLinesWidth else 0)
             + trim_text('Task', nameLen)
             + ' '
@@ -91,44 +138,31 @@ class ScreenRenderer:
             + ' '
             + trim_text('Status', statusLen)
             + ' '
-            + trim_text('Message', msgLen),
+            + trim_text('Message', msgLen)
         )
-        self.lines[2].refresh()
+        self._drawLine(2, [(header, 0)])
 
-        for win, taskModel in zip(taskWin, visibleTasks):
-            self._showTask(taskModel, win, numLinesWidth, nameLen, elapsedLen, statusLen, msgLen)
+        now = datetime.datetime.now()
+        for lineIndex, taskModel in enumerate(visibleTasks, screenTaskStart):
+            columns = self._taskColumns(taskModel, now, numLinesWidth, nameLen, elapsedLen, statusLen, msgLen)
+            self._drawLine(lineIndex, columns)
 
-    def _showTask(self, taskModel, win, numLinesWidth, nameLen, elapsedLen, statusLen, msgLen):
+    def _taskColumns(self, taskModel, now, numLinesWidth, nameLen, elapsedLen, statusLen, msgLen):
         task = taskModel.task
-        now = datetime.datetime.now()
         elapsed = (task.stopTime or now) - (task.startTime or now)
 
-        taskColor = (
-            self.colors.get('grey')
-            if task.status == TaskStatus.NOT_STARTED
-            else self.colors.get('dark grey')
-            if task.status == TaskStatus.DISABLED
-            else self.colors.get('light grey')
-            if task.status == TaskStatus.RUNNING
-            else self.colors.get('green')
-            if task.status == TaskStatus.COMPLETED
-            else self.colors.get('red')
-        )
-
-        win.clear()
+        taskColor = self.statusColors[task.status]
 
         dp = taskModel.displayPrefix
-        disable = list(reversed(taskModel.get_ancestry_disabled_status()))
-
-        try:
-            index = disable.index(True)
-            dp1 = dp[:index]
-            dp2 = dp[index:]
-        except ValueError:
+        if taskModel.disabledDepth is None:
             dp1 = dp
             dp2 = ''
+        else:
+            dp1 = dp[: taskModel.disabledDepth]
+            dp2 = dp[taskModel.disabledDepth :]
 
         fn = trim_text(dp + taskModel.name, nameLen).removeprefix(dp)
+        message = f'[+] {taskModel.aggregate_message()}' if taskModel.collapsed else task.message
 
         columns = []
 
@@ -150,50 +184,102 @@ class ScreenRenderer:
                     self.colors.get('orange'),
                 ),
                 (
-                    trim_text(task.message + ' ', (msgLen - numLinesWidth) if numLinesWidth > 0 else msgLen),
+                    trim_text(message + ' ', (msgLen - numLinesWidth) if numLinesWidth > 0 else msgLen),
                     self.colors.get('light grey'),
                 ),
             ]
         )
 
-        for t, c in columns:
-            win.addstr(t, c)
-        win.refresh()
+        return columns
 
     def _showOptions(self):
         numVisibleTasks = self._numVisibleTasks()
-        win = self.lines[3 + numVisibleTasks + 1]
-        win.clear()
+        optionsLine = 3 + numVisibleTasks + 1
         options = []
         match self.model.inputMode:
             case InputMode.NONE:
                 options.append('[S] Start')
                 options.append('[X] exit')
-                if numVisibleTasks < len(self.model.tasks):
+                if numVisibleTasks < len(self.model.visibleTasks):
                     options.append('[↑] scroll up')
                     options.append('[↓] scroll down')
+                    options.append('[PgUp/PgDn] page')
 
             case InputMode.GET_TASK:
-                options.append(f'task index: {self.model.selectedTaskText}')
+                options.append(f'task index or path: {self.model.selectedTaskText}')
 
             case InputMode.GET_COMMAND:
                 if self.model.selectedTask.task.status != TaskStatus.DISABLED:
                     options.append('[D] Disable')
                 else:
                     options.append('[E] enable')
-                if self.model.selectedTask.task.status == TaskStatus.RUNNING:
+                selectedTask = self.model.selectedTask.task
+                if selectedTask.status == TaskStatus.RUNNING or is_waiting_for_resources(selectedTask):
                     options.append('[C] cancel')
-
-        win.addstr('   '.join(options))
-
-        win.refresh()
+                if self.model.selectedTask.subtasks:
+                    options.append('[F] unfold' if self.model.selectedTask.collapsed else '[F] fold')
+                if get_output_path(self.model.selectedTask.task):
+                    options.append('[O] output')
+
+        self._drawLine(optionsLine, [('   '.join(options), 0)])
+
+        for lineIndex in range(3 + numVisibleTasks, self.maxy):
+            if lineIndex != optionsLine:
+                self._clearLine(lineIndex)
+
+    def _showPager(self):
+        pager = self.model.pager
+        pager.pageSize = self.maxy - 3
+        pager.update()
+        width = self.maxx - 1
+
+        self._drawLine(0, [(trim_text(pager.title, width), self.colors.get('grey'))])
+        lines = pager.visible_lines(width)
+        for lineIndex in range(pager.pageSize):
+            if lineIndex < len(lines):
+                self._drawLine(lineIndex + 1, [(lines[lineIndex], self.colors.get('light grey'))])
+            else:
+                self._clearLine(lineIndex + 1)
+
+        status = [(pager.position() + '   ', self.colors.get('orange'))]
+        if pager.message:
+            status.append((pager.message, self.colors.get('red')))
+        self._drawLine(self.maxy - 2, [(t[:width], c) for t, c in status])
+
+        if self.model.inputMode == InputMode.PAGER_SEARCH:
+            options = f'search: {pager.searchText}'
+        else:
+            options = '   '.join(
+                [
+                    '[↑/↓] scroll',
+                    '[PgUp/PgDn] page',
+                    '[Home/End] top/end',
+                    '[/] search',
+                    '[n/N] next/previous',
+                    '[Q] close',
+                ]
+            )
+        self._drawLine(self.maxy - 1, [(options[:width], 0)])
 
     def _updateScroll(self):
-        if self.model.scroll:
-            self.taskStartIndex = median(
-                [0, self.taskStartIndex + self.model.scroll, len(self.model.tasks) - self._numVisibleTasks()]
-            )
+        numVisibleTasks = self._numVisibleTasks()
+        self.model.pageSize = numVisibleTasks
+        if self.model.jumpToRow is not None:
+            if not self.taskStartIndex <= self.model.jumpToRow < self.taskStartIndex + numVisibleTasks:
+                self.taskStartIndex = self.model.jumpToRow - numVisibleTasks // 2
+            self.model.jumpToRow = None
+        elif self.model.scroll:
+            self.taskStartIndex += self.model.scroll
             self.model.scroll = 0
+        self.taskStartIndex = median([0, self.taskStartIndex, len(self.model.visibleTasks) - numVisibleTasks])
+
+    def frame_stats(self):
+        return {
+            'frames': self.frameCount,
+            'linesDrawn': self.linesDrawn,
+            'lastFrameTime': self.lastFrameTime,
+            'averageFrameTime': self.frameTime / self.frameCount if self.frameCount else 0.0,
+        }
 
 
 def notify(message):
@@ -216,4 +302,6 @@ async def display(stdscr, model: PipelineModel):
     sr = ScreenRenderer(stdscr, model)
     while True:
         sr.update()
+        if sr.frameCount % 600 == 0:
+            logger.debug(f'frame stats: {sr.frame_stats()}')
         await asyncio.sleep(0.1)